@@ -0,0 +1,184 @@
+"""Benchmarks for encoding, decoding and reading jelka data.
+
+Everything runs offline on data generated in memory. Run from the top level:
+    python benchmarks/bench.py            # print results
+    python benchmarks/bench.py --save     # store results as the new baseline
+    python benchmarks/bench.py --check    # fail if something got slower than the baseline
+
+Results are divided by the speed of a small pure Python calibration loop before
+they are stored or compared, so a baseline made on one machine is (roughly)
+usable on another one."""
+
+import argparse
+import json
+import os
+import sys
+import timeit
+from random import Random
+
+from jelka_validator import DataReader
+from jelka_validator.datareader import BytesReader
+from jelka_validator.utils import decode_frame, encode_binary_frame, encode_frame, encode_header
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+LED_COUNTS = (100, 500, 2000, 10000)
+CHUNK_SIZES = (512, 4093, 65536)  # 4093 is prime, so chunks are cut at different places in every frame
+FPS = (30, 60, 120)
+DISPLAY_FPS = 60
+STREAM_FRAMES = 120
+
+
+def random_frame(led_count, seed=0):
+    rnd = Random(seed)
+    return [(rnd.randrange(256), rnd.randrange(256), rnd.randrange(256)) for _ in range(led_count)]
+
+
+def stream(led_count, fps, frames=STREAM_FRAMES, version=0):
+    """Returns bytes of a whole stream with some user output between frames."""
+
+    parts = [("#" + encode_header(led_count, fps, version=version) + os.linesep).encode()]
+    for i in range(frames):
+        frame = random_frame(led_count, i % 8)
+        if version == 0:
+            parts.append(("#" + encode_frame(frame, led_count) + os.linesep).encode())
+        else:
+            parts.append(encode_binary_frame(frame, led_count))
+        if i % 10 == 0:
+            parts.append(f"frame {i}{os.linesep}".encode())
+    return b"".join(parts)
+
+
+def chunked(data, size):
+    return [data[i : i + size] for i in range(0, len(data), size)]
+
+
+def bench_encode(led_count):
+    frame = random_frame(led_count)
+    return (lambda: encode_frame(frame, led_count)), 1, 3 * led_count
+
+
+def bench_decode(led_count):
+    text = encode_frame(random_frame(led_count), led_count).encode()
+    return (lambda: decode_frame(text, led_count, version=0)), 1, len(text)
+
+
+def bench_read_more(led_count, chunk_size):
+    chunks = chunked(stream(led_count, 60), chunk_size)
+
+    def run():
+        reader = BytesReader()
+        for chunk in chunks:
+            reader.read_more(chunk)
+
+    return run, STREAM_FRAMES, sum(map(len, chunks))
+
+
+def bench_reader(led_count, fps, version=0):
+    """Producer writes at fps, the frames are shown at DISPLAY_FPS."""
+
+    chunks = chunked(stream(led_count, fps, version=version), 65536)
+    shown = STREAM_FRAMES * DISPLAY_FPS // fps
+
+    def run():
+        clock = Clock()
+        pending = list(reversed(chunks))
+        reader = DataReader(lambda: pending.pop() if pending else b"", realtime=True, clock=clock)
+        for _ in range(shown):
+            next(reader)
+            clock.now += 1 / DISPLAY_FPS
+        while pending:
+            reader.update()
+        reader.update()
+        assert reader.frames.end == STREAM_FRAMES
+
+    return run, STREAM_FRAMES, sum(map(len, chunks))
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def cases(quick=False):
+    led_counts = LED_COUNTS[:2] if quick else LED_COUNTS
+    for led_count in led_counts:
+        yield f"encode_frame/{led_count}", bench_encode(led_count)
+        yield f"decode_frame/{led_count}", bench_decode(led_count)
+        for chunk_size in CHUNK_SIZES:
+            yield f"read_more/{led_count}/chunk={chunk_size}", bench_read_more(led_count, chunk_size)
+        for fps in FPS:
+            yield f"DataReader/{led_count}/fps={fps}", bench_reader(led_count, fps)
+        yield f"DataReader/{led_count}/fps=60/version=1", bench_reader(led_count, 60, version=1)
+
+
+def measure(func, repeat, duration=0.05):
+    """Returns the best time of a single call. Every repetition takes about duration seconds."""
+
+    timer = timeit.Timer(func)
+    number = max(int(duration / timer.timeit(1)), 1)
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def calibrate(repeat):
+    """Returns calls per second of a small pure Python workload (bytes and int handling)."""
+
+    data = bytes(range(256)) * 16
+
+    def work():
+        total = 0
+        for i in range(0, len(data), 3):
+            total += data[i] * 3 + i
+        return bytes(total % 256 for _ in range(64)).hex()
+
+    return 1 / measure(work, repeat)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks for jelka_validator.")
+    parser.add_argument("--save", action="store_true", help="store the results as the baseline")
+    parser.add_argument("--check", action="store_true", help="exit with 1 if a result is worse than the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed slowdown, 0.5 means 50%% (default)")
+    parser.add_argument("--quick", action="store_true", help="only small led counts")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline", default=BASELINE)
+    args = parser.parse_args(argv)
+
+    calibration = calibrate(args.repeat)
+    baseline = {}
+    if args.check:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+
+    print(f"{'benchmark':<42}{'frames/s':>12}{'MB/s':>10}{'baseline':>10}")
+    results = {}
+    failed = []
+    for name, (func, frames, size) in cases(args.quick):
+        seconds = measure(func, args.repeat)
+        score = frames / seconds / calibration
+        results[name] = score
+
+        ratio = ""
+        if name in baseline:
+            ratio = f"{score / baseline[name]:.0%}"
+            if score < baseline[name] * (1 - args.tolerance):
+                failed.append(name)
+        print(f"{name:<42}{frames / seconds:>12.0f}{size / seconds / 1e6:>10.1f}{ratio:>10}")
+
+    if args.save:
+        with open(args.baseline, "w") as f:
+            json.dump({"results": results}, f, indent=4, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline saved to {args.baseline}.")
+
+    if failed:
+        print(f"Slower than the baseline: {', '.join(failed)}.")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
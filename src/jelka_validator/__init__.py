@@ -1,5 +1,9 @@
+from .asyncreader import AsyncDataReader
 from .datareader import DataReader
+from .frame import Frame
 
 __all__ = [
+    "AsyncDataReader",
     "DataReader",
+    "Frame",
 ]
@@ -0,0 +1,114 @@
+"""The AsyncDataReader class reads jelka data from an asyncio stream.
+
+It uses the same BytesReader as DataReader, but the reading is done with await,
+so one event loop can read many patterns and draw at the same time without
+blocking on pipes. Unlike DataReader, every frame is returned, in order,
+as soon as it arrives. Timing is left to the caller."""
+
+import asyncio
+from collections import deque
+
+from .datareader import BytesReader
+from .usersink import UserSink
+
+
+class AsyncDataReader:
+    """Reads jelka data from an asyncio.StreamReader, for example stdout of a process
+    (see from_subprocess). Frames are returned with async for:
+
+        reader = await AsyncDataReader.from_subprocess(sys.executable, "pattern.py")
+        header = await reader.read_header()
+        async for frame in reader:
+            reader.user_print()
+            ...
+    """
+
+    def __init__(
+        self,
+        stream: asyncio.StreamReader,
+        chunk_size: int = 65536,
+        user_sink: "None | UserSink" = None,
+    ) -> None:
+        """user_sink takes user output as soon as it is read (see usersink),
+        otherwise it is kept until user_print is called."""
+        self.header = None
+
+        # Header values
+        self.version = None
+        self.led_count = None
+        self.fps = None
+
+        # Frame values
+        self.frames = deque()  # frames that were read, but not returned yet
+        self.frame_count = 0  # frames returned so far
+
+        # Getting input
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.bytes_reader = BytesReader(user_sink=user_sink)
+        self.eof = False
+        self.process: "None | asyncio.subprocess.Process" = None
+
+    @classmethod
+    async def from_subprocess(cls, program, *args, **kwargs) -> "AsyncDataReader":
+        """Starts a process with asyncio.create_subprocess_exec and reads its stdout.
+        Other keyword arguments are passed to create_subprocess_exec."""
+
+        process = await asyncio.create_subprocess_exec(program, *args, stdout=asyncio.subprocess.PIPE, **kwargs)
+        reader = cls(process.stdout)  # type: ignore
+        reader.process = process
+        return reader
+
+    async def update(self) -> bool:
+        """Reads and parses the next chunk of the stream.
+        Returns False if the stream has ended."""
+
+        data = await self.stream.read(self.chunk_size)
+        if not data:
+            self.eof = True
+            return False
+
+        self.bytes_reader.read_more(data)
+        if not self.header:
+            self.try_read_header()
+        if self.header:
+            self.frames.extend(self.bytes_reader.try_get_frames(lazy=True))
+        return True
+
+    def try_read_header(self):
+        header = self.bytes_reader.try_get_header()
+        if header:
+            self.header = header
+            self.version = header["version"]
+            self.led_count = header["led_count"]
+            self.fps = header["fps"]
+
+    async def read_header(self) -> dict:
+        """Waits for the header and returns it.
+        Raises an EOFError if the stream ends before the header."""
+
+        while not self.header:
+            if self.eof or not await self.update():
+                raise EOFError("Stream ended before the header.")
+        return self.header
+
+    def user_print(self, flush=True, end=""):
+        self.bytes_reader.user_print(flush=flush, end=end)
+
+    async def close(self):
+        """Kills the process started by from_subprocess (if it is still running) and waits for it."""
+
+        if self.process is not None and self.process.returncode is None:
+            self.process.kill()
+            await self.process.wait()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while not self.frames:
+            if self.eof or not await self.update():
+                raise StopAsyncIteration
+
+        self.frame_count += 1
+        return self.frames.popleft().decode()
@@ -7,12 +7,12 @@ All jelka data must be prefixed with a "#". The header must be the first jelka d
 
 The header starts with a "#" and must be in a single line.
 It can be any JSON object with the following keys
-For version 0:
-- version: 0
+For version 0 and 1:
+- version: 0 or 1
 - led_count: int
 - fps: int
 
-Current version is 0. Older versions will be supported as long as possible.
+Current version is 1. Older versions will be supported as long as possible.
 
 An example header:
 '#{"version": 0, "led_count": 500, "fps": 60}\n'
@@ -24,116 +24,517 @@ The values are concatenated in the order r, g, b.
 For example a 3 LED frame with values (0, 1, 2), (3, 4, 5), (0, 150, 255) would be
 "#0001020304050096ff\n".
 
+In version 1 frames are binary records instead of lines. A record is a "#",
+the record type (a single byte, 0x01 for raw frames), the length of the payload
+as 4 byte big-endian unsigned integer and the payload. Raw frames have 3 bytes
+r, g, b for every LED, so the same frame would be
+b"#\\x01\\x00\\x00\\x00\\x09\\x00\\x01\\x02\\x03\\x04\\x05\\x00\\x96\\xff".
+There is no newline after a record.
+
+A version 1 header can also have the key "encodings" with a list of other record
+types the writer may use: "delta" (0x02, spans of LEDs that changed since the
+previous frame), "rle" (0x03, runs of LEDs with the same color) and "repeat"
+(0x04, no payload, the previous frame again). See utils for their payloads.
+
 All lines that are not prefixed with a "#" are considered user output and
 can be printed to stdout."""
 
-from .utils import decode_header, decode_frame
+from .frame import Frame
+from .framequeue import FrameQueue
+from .stats import ReaderStats
+from .usersink import UserSink
+from .utils import (
+    ENCODINGS,
+    MAX_PAYLOAD_PER_LED,
+    RECORD_DELTA,
+    RECORD_HEADER_SIZE,
+    RECORD_RAW,
+    RECORD_REPEAT,
+    RECORD_RLE,
+    RECORD_TYPES,
+    apply_delta,
+    decode_frame,
+    decode_header,
+    decode_rle,
+    record_length,
+)
+import codecs
+import io
 import os
+import threading
+import time
+from collections import deque
+from time import perf_counter
+
 linesepb = os.linesep.encode(encoding="utf-8")
 
 
 class BytesReader:
     """Reads jelka data from bytes. The data must be in the required format.
     You can feed it bytes in chunks. The data will not be decoded and returned
-    until it is required."""
-
-    def __init__(self) -> None:
+    until it is required.
+
+    stats is a ReaderStats object that is updated while reading (None to turn statistics off).
+    on_header, on_frame and on_parse_error are optional callbacks, called with the header
+    dict, every parsed Frame (not decoded yet if it is lazy) and every ValueError raised
+    because of invalid data.
+
+    Invalid data (a header, a line or a record) is always removed from the buffer, so reading
+    can go on after an error. By default the error is raised (frames parsed before the invalid
+    data are returned by the next try_get_frames). If tolerant is True, invalid
+    data is only counted (error_count) and passed to on_parse_error, the reader skips it
+    and continues with the next line or record.
+
+    User output is kept in user_buffer until user_print is called. If user_sink is given
+    (see usersink), the output is passed to it after every read_more instead.
+
+    A frame line that is byte-identical to the previous one (compared in the buffer, before
+    anything is decoded) gives the same Frame object as the previous frame, as do repeat
+    records and raw or rle records equal to the previous record. duplicates counts them."""
+
+    def __init__(
+        self,
+        stats: "None | ReaderStats" = None,
+        on_header=None,
+        on_frame=None,
+        on_parse_error=None,
+        tolerant: bool = False,
+        user_sink: "None | UserSink" = None,
+    ) -> None:
         self.mode = "user"
-        self.jelka_buffer = b""
-        self.user_buffer = b""
+        self.jelka_buffer = bytearray()
+        self.user_buffer = bytearray()
+        self.user_sink = user_sink
+        # a character can be split between two calls of user_print
+        self.user_decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
         self.version: "None | int" = None
         self.led_count: "None | int" = None
+        self.record_types = bytes((RECORD_RAW,))  # record types allowed by the header
+        self.last_frame: "None | Frame" = None  # the base for delta and repeat records
+        # Duplicate frames: a frame line (or raw or rle record) that is byte-identical to the
+        # previous one is not decoded again, the previous Frame object is used instead
+        self.last_line: "None | bytearray" = None
+        self.last_line_frame: "None | Frame" = None
+        self.last_record: "None | tuple" = None  # (record type, payload) of last_frame
+        self.duplicates = 0
+
+        # What kind of jelka data is being read: None (not known yet), "line" or "record"
+        self.kind: "None | str" = None
+        self.record_header_left = 0  # bytes of the binary record header that did not arrive yet
+        self.record_left = 0  # bytes of the binary record payload that did not arrive yet
+        self.pending_frames = []  # frames parsed before an error was raised, returned next time
+
+        # Instrumentation
+        self.stats = stats
+        self.on_header = on_header
+        self.on_frame = on_frame
+        self.on_parse_error = on_parse_error
+
+        # Errors
+        self.tolerant = tolerant
+        self.error_count = 0
+
+    def read_more(self, inp: "bytes | bytearray", size: "None | int" = None):
+        """Splits inp into user output and jelka data. Jelka data starts with a "#"
+        and ends with a newline or is a binary record of known length (version 1).
+        The mode is kept between calls, so inp can be cut anywhere, even in the
+        middle of a newline or a record header.
+
+        If size is given, only the first size bytes of inp are read. The data is copied,
+        so inp can be a buffer that is reused for the next read (see readinto_function)."""
+
+        if size is None:
+            size = len(inp)
+        if not size:
+            return
 
-    def read_more(self, inp: bytes):
-        user_add = []  # new other stuff
-        jelka_add = []  # new jelka data
-
-        if not inp:
+        stats = self.stats
+        if stats is None:
+            self._read_more(inp, size)
             return
-        
-        i = 0
-        while i < len(inp):
-            byte = inp[i]
-            if self.mode == "user" and byte == ord("#"):
-                self.mode = "jelka"
 
-            if self.mode == "jelka":
-                jelka_add.append(byte.to_bytes(length=1, byteorder="big"))
-            elif self.mode == "user":
-                user_add.append(byte.to_bytes(length=1, byteorder="big"))
+        start = perf_counter()
+        self._read_more(inp, size)
+        stats.read_time += perf_counter() - start
+        stats.bytes_read += size
+        stats.chunks_read += 1
+        stats.jelka_buffer_size = len(self.jelka_buffer)
+        stats.user_buffer_size = len(self.user_buffer)
+        stats.max_jelka_buffer_size = max(stats.max_jelka_buffer_size, len(self.jelka_buffer))
+
+    def _read_more(self, inp: "bytes | bytearray", size: int):
+        view = memoryview(inp)
+        pos = 0
+        while pos < size:
+            if self.mode == "user":
+                start = inp.find(b"#", pos, size)
+                if start == -1:
+                    self.user_buffer += view[pos:size]
+                    break
+
+                self.user_buffer += view[pos:start]
+                self.jelka_buffer += b"#"
+                self.mode = "jelka"
+                self.kind = None
+                pos = start + 1
+                continue
 
-            # Things that can are used for newlines
-            if self.mode == "jelka" and inp[i : i + len(linesepb)] == linesepb:
-                self.mode = "user"
-                jelka_add.append(linesepb[1:])
-                i += len(linesepb)
+            if self.kind is None:
+                # the byte after "#" tells if this is a binary record
+                if inp[pos] in RECORD_TYPES:
+                    self.kind = "record"
+                    self.record_header_left = RECORD_HEADER_SIZE - 1
+                else:
+                    self.kind = "line"
+
+            if self.kind == "record":
+                if self.record_header_left:
+                    take = min(self.record_header_left, size - pos)
+                    self.jelka_buffer += view[pos : pos + take]
+                    self.record_header_left -= take
+                    pos += take
+                    if self.record_header_left:
+                        break
+                    self.record_left = int.from_bytes(self.jelka_buffer[-4:], byteorder="big")
+                    if self.led_count is not None and self.record_left > MAX_PAYLOAD_PER_LED * self.led_count:
+                        # a corrupt length, only the record header is kept (see _get_frames)
+                        self.record_left = 0
+
+                take = min(self.record_left, size - pos)
+                self.jelka_buffer += view[pos : pos + take]
+                self.record_left -= take
+                pos += take
+                if not self.record_left:
+                    self.mode = "user"
                 continue
-            
-            i += 1
 
-        self.user_buffer += b"".join(user_add)
-        self.jelka_buffer += b"".join(jelka_add)
+            if pos == 0:
+                # the newline could have started at the end of the previous chunk
+                stop = self._split_linesep_end(inp, size)
+            else:
+                stop = -1
+
+            if stop == -1:
+                stop = inp.find(linesepb, pos, size)
+                if stop == -1:
+                    self.jelka_buffer += view[pos:size]
+                    break
+                stop += len(linesepb)
+
+            self.jelka_buffer += view[pos:stop]
+            self.mode = "user"
+            pos = stop
+
+        view.release()
+
+        if self.user_sink is not None and self.user_buffer:
+            self.user_sink.write(bytes(self.user_buffer))
+            self.user_buffer.clear()
+
+    def _split_linesep_end(self, inp: "bytes | bytearray", size: int) -> int:
+        """Returns the index in inp right after a newline that was started
+        in the previous chunk or -1 if there is no such newline."""
+
+        for i in range(1, len(linesepb)):
+            if self.jelka_buffer.endswith(linesepb[:i]) and inp.startswith(linesepb[i:], 0, size):
+                return len(linesepb) - i
+        return -1
 
     def try_get_header(self) -> "None | dict":
-        # find the end of the header (newline)
-        header_end = self.jelka_buffer.find(linesepb)
+        while True:
+            # find the end of the header (newline)
+            header_end = self.jelka_buffer.find(linesepb)
+
+            if header_end == -1:
+                return None
+
+            try:
+                text = self.jelka_buffer[0:header_end].decode(encoding="utf-8")
+                text = text.lstrip("#")
+                text = text.strip()
+                header = decode_header(text)
+                break
+            except ValueError as error:
+                # an invalid header is skipped, the next line can be a valid one
+                del self.jelka_buffer[: header_end + len(linesepb)]
+                self.parse_error(error)
+                if not self.tolerant:
+                    raise
+
+        self.set_header(header)
 
-        if header_end == -1:
-            return None
+        # remove what has already been used
+        del self.jelka_buffer[: header_end + len(linesepb)]
+
+        if self.on_header is not None:
+            self.on_header(header)
+        return header
 
-        text = self.jelka_buffer[0 : header_end + 1].decode(encoding="utf-8")
-        text = text.lstrip("#")
-        text = text.strip()
-        header = decode_header(text)
+    def set_header(self, header: dict):
+        """Takes the values that are required to parse frames from a decoded header."""
 
-        # some values are required to parse frames
         self.version = header["version"]
         self.led_count = header["led_count"]
+        encodings = header.get("encodings", [])
+        self.record_types = bytes({RECORD_RAW} | {ENCODINGS[encoding] for encoding in encodings})
 
-        # remove what has already been used
-        self.jelka_buffer = self.jelka_buffer[header_end + 1 :]
+    def try_get_frames(self, limit: "None | int" = None, lazy: bool = False) -> list:
+        """Decodes and returns complete frames from the buffer.
+        At most limit frames are returned, the rest stay in the buffer.
 
-        return header
+        If lazy is True, frames only get a cheap length check and are decoded
+        when they are first accessed (see Frame.from_line)."""
 
-    def try_get_frames(self) -> list:
         if self.version is None:
             raise ValueError("Header must be read before frames.")
-        self.version  # type: int
 
-        # find the end of the frame (newline)
-        frame_end = self.jelka_buffer.find(linesepb)
-        if frame_end == -1:
-            return []
+        stats = self.stats
+        start = perf_counter() if stats is not None else 0.0
+        frames = self._get_frames(limit, lazy)
+
+        if stats is not None:
+            stats.parse_time += perf_counter() - start
+            stats.frames_parsed += len(frames)
+            stats.jelka_buffer_size = len(self.jelka_buffer)
+        if self.on_frame is not None:
+            for frame in frames:
+                self.on_frame(frame)
+        return frames
+
+    def _get_frames(self, limit: "None | int", lazy: bool) -> list:
 
+        buffer = self.jelka_buffer
+        led_count: int = self.led_count  # type: ignore
+        expected_length = 3 * led_count * 2
         frame_start = 0
-        frames = []
-        while frame_end != -1:
-            text = self.jelka_buffer[frame_start : frame_end + 1].decode(encoding="utf-8")
-            text = text.strip(os.linesep)
-            text = text.lstrip("#")
-
-            # Get the frame
-            frame = decode_frame(text, self.led_count, self.version)  # type: ignore
-            frames.append(frame)
+        frames = self.pending_frames
+        self.pending_frames = []
+        if limit is not None and len(frames) >= limit:
+            self.pending_frames = frames[limit:]
+            return frames[:limit]
+
+        while len(buffer) - frame_start >= 2 and (limit is None or len(frames) < limit):
+            next_start = frame_start
+            try:
+                if buffer[frame_start + 1] in RECORD_TYPES:
+                    # binary record (version 1)
+                    length = record_length(buffer, frame_start)
+                    if length == -1:
+                        break
+                    try:
+                        self.check_record_length(length)
+                    except ValueError:
+                        next_start = self.skip_record_header(frame_start)
+                        raise
+                    if frame_start + length > len(buffer):
+                        break
+                    frame_end = frame_start + length
+                    next_start = frame_end
+                    if self.version == 0:
+                        raise ValueError("Binary frames are not supported in version 0.")
+
+                    payload = buffer[frame_start + RECORD_HEADER_SIZE : frame_end]
+                    frame = self.decode_record(buffer[frame_start + 1], payload)
+                else:
+                    # find the end of the frame (newline)
+                    frame_end = buffer.find(linesepb, frame_start + 1)
+                    if frame_end == -1:
+                        break
+                    next_start = frame_end + len(linesepb)
+                    if self.version != 0:
+                        raise ValueError(f"Frames must be binary records in version {self.version}.")
+
+                    last_line = self.last_line
+                    if (
+                        last_line is not None
+                        and frame_end - frame_start - 1 == len(last_line)
+                        and buffer.startswith(last_line, frame_start + 1)
+                    ):
+                        # the same line as the previous frame, compared without a copy
+                        self.duplicates += 1
+                        frames.append(self.last_line_frame)
+                        frame_start = next_start
+                        continue
+
+                    # Get the frame (without the "#" and the newline)
+                    text = buffer[frame_start + 1 : frame_end]
+                    if lazy:
+                        if len(text) != expected_length:
+                            raise ValueError(
+                                f"Frame has wrong size, expected exactly {expected_length} bytes, found {len(text)}."
+                            )
+                        frame = Frame.from_line(text, led_count, self.version)  # type: ignore
+                    else:
+                        frame = decode_frame(text, led_count, self.version)  # type: ignore
+                    self.last_line = text
+                    self.last_line_frame = frame
+            except ValueError as error:
+                self.parse_error(error)
+                if not self.tolerant:
+                    # valid frames before the invalid data are returned next time, they must not be parsed again
+                    del buffer[:next_start]
+                    self.pending_frames = frames
+                    raise
+                # skip the invalid data, the next frame starts right after it
+                frame_start = next_start
+                continue
 
-            # find the start and the end of the next frame
-            frame_start = frame_end + len(linesepb)
-            frame_end = self.jelka_buffer.find(linesepb, frame_start + 1)
+            frames.append(frame)
+            frame_start = next_start
 
         # remove what has already been used
-        self.jelka_buffer = self.jelka_buffer[frame_start:]
+        del self.jelka_buffer[:frame_start]
 
         return frames
 
+    def check_record_length(self, length: int):
+        """Raises a ValueError if no valid record is length bytes long (with the header),
+        so the length is corrupt."""
+
+        led_count = self.led_count or 0
+        if length > RECORD_HEADER_SIZE + MAX_PAYLOAD_PER_LED * led_count:
+            raise ValueError(f"Record is too long for a frame of {led_count} leds ({length} bytes).")
+
+    def skip_record_header(self, start: int) -> int:
+        """Drops a record at start that has a corrupt length. Everything after its header
+        is read again as new input, so the next "#" starts the next frame.
+        Returns where the record header ends."""
+
+        end = start + RECORD_HEADER_SIZE
+        rest = bytes(self.jelka_buffer[end:])
+        del self.jelka_buffer[end:]
+        self.mode = "user"
+        self.record_left = 0
+        self._read_more(rest, len(rest))
+        return end
+
+    def decode_record(self, record_type: int, payload: "bytes | bytearray | memoryview") -> Frame:
+        """Decodes the payload of a binary record. Delta and repeat records are applied
+        to the previous frame, a repeat record returns the same Frame object. So does
+        a raw or rle record that is the same as the record of the previous frame."""
+
+        if record_type not in self.record_types:
+            raise ValueError(f"Record type {record_type} is not allowed by the header.")
+
+        last_record = self.last_record
+        if last_record is not None and last_record[0] == record_type and last_record[1] == payload:
+            self.duplicates += 1
+            return self.last_frame  # type: ignore
+
+        if record_type == RECORD_RAW:
+            frame = decode_frame(payload, self.led_count, self.version)  # type: ignore
+        elif record_type == RECORD_RLE:
+            frame = Frame(decode_rle(payload, self.led_count))  # type: ignore
+        elif self.last_frame is None:
+            raise ValueError("Delta and repeat records need a previous frame.")
+        elif record_type == RECORD_REPEAT:
+            if payload:
+                raise ValueError("Repeat record must not have a payload.")
+            self.duplicates += 1
+            return self.last_frame
+        else:
+            data = bytearray(self.last_frame.data)
+            apply_delta(data, payload)
+            frame = Frame(data)
+
+        # delta records depend on the previous frame, the same delta can give a different frame
+        self.last_record = (record_type, bytes(payload)) if record_type != RECORD_DELTA else None
+        self.last_frame = frame
+        return frame
+
+    def parse_error(self, error: ValueError):
+        """Counts an error in the data and passes it to on_parse_error."""
+
+        self.error_count += 1
+        if self.stats is not None:
+            self.stats.parse_errors += 1
+        if self.on_parse_error is not None:
+            self.on_parse_error(error)
+
     def user_print(self, flush=True, end=""):
-        print(self.user_buffer.decode(encoding="utf-8"), end=end, flush=flush)
-        self.user_buffer = b""
+        print(self.user_decoder.decode(self.user_buffer), end=end, flush=flush)
+        self.user_buffer.clear()
+
+
+def readinto_function(source):
+    """Returns a function that reads from source into a given buffer and returns
+    the number of bytes read (0 at the end of input), see DataReader readinto.
+    source can be a file descriptor, a socket or a binary stream (for example
+    sys.stdin.buffer or Popen.stdout), readinto1 is used if the stream has it."""
+
+    if isinstance(source, int):
+        return io.FileIO(source, closefd=False).readinto
+    for name in ("recv_into", "readinto1", "readinto"):
+        if hasattr(source, name):
+            return getattr(source, name)
+    raise TypeError(f"Can not read into a buffer from {type(source)}.")
 
 
 class DataReader:
-    def __init__(self, bytes_getter) -> None:
+    def __init__(
+        self,
+        bytes_getter=None,
+        capacity: "None | int" = None,
+        policy: str = "drop_oldest",
+        realtime: bool = False,
+        clock=time.monotonic,
+        sleep=time.sleep,
+        threaded: bool = False,
+        stats: bool = False,
+        on_header=None,
+        on_frame=None,
+        on_parse_error=None,
+        tolerant: bool = False,
+        user_sink: "None | UserSink" = None,
+        readinto=None,
+        buffer_size: int = 65536,
+        stages: "None | list" = None,
+    ) -> None:
         """Reads data to Python objects. bytes_getter is a function that returns bytes.
-        It will probably be something like sys.stdin.buffer.read or Popen.stdin.read1."""
+        It will probably be something like sys.stdin.buffer.read or Popen.stdin.read1.
+
+        Instead of bytes_getter, readinto can be given: a function that reads into a buffer
+        and returns the number of bytes read, like RawIOBase.readinto or socket.recv_into
+        (see readinto_function). Input is then read into a single reusable buffer of
+        buffer_size bytes, so no new bytes object is made for every read.
+
+        Frames are stored in a FrameQueue that holds at most capacity frames (unbounded by default).
+        policy is one of "drop_oldest", "latest" and "block" and decides what happens when
+        the queue is full (see framequeue). With "block" the reader stops reading input until
+        there is space, so a pattern writing to a pipe waits for the reader.
+
+        By default every call of __next__ moves one frame forward. If realtime is True,
+        __next__ instead returns the frame that should be shown now, according to clock
+        (seconds, monotonic) and the fps from the header. The time of the first frame is
+        when the first frame arrives. Use wait_for_next_frame to sleep until the next frame.
+
+        If threaded is True, a daemon thread (started by start or the first update) calls
+        bytes_getter and parses the input, so __next__ only has to pick a frame. bytes_getter
+        must then block until there is data and return b"" only at the end of input (eof)
+        (readinto must return 0).
+        Invalid data found by the thread is raised in update (one ValueError per call) and
+        the thread goes on reading, other errors from the thread end it and are raised in
+        every update. Call close (or use the reader as a context manager) to stop the thread.
+
+        If stats is True, counters and timings are collected in self.stats (a ReaderStats,
+        see stats), otherwise self.stats is None. on_header, on_frame and on_parse_error
+        are callbacks (see BytesReader). In threaded mode they are called from the thread.
+
+        By default invalid data raises a ValueError in update or __next__ (the invalid part is
+        skipped, so the reader can be used again). If tolerant is True, invalid data is skipped
+        without an error: it is counted in bytes_reader.error_count and passed to on_parse_error.
+        A frame that fails to decode in __next__ is then replaced by the previous frame.
+
+        user_sink takes user output as soon as it is read (see usersink), otherwise it is
+        kept until user_print is called. In threaded mode the sink is called from the thread.
+
+        stages are functions that take a Frame and return a Frame (for example an OutputTransform,
+        see transform). They are applied in order to every frame when it is returned the first time,
+        a frame that is returned again (there is nothing newer) is not transformed again.
+
+        A frame that is byte-identical to the previous one is not decoded again, the same Frame
+        object is used (see BytesReader). After __next__, unchanged is True if the returned frame
+        is the same as the one before, so sending or drawing it again can be skipped."""
         self.header = None
 
         # Header values
@@ -142,26 +543,148 @@ class DataReader:
         self.fps = None
 
         # Frame values
-        self.frames = []
+        self.frames = FrameQueue(capacity, policy)
         self.frame_count = 0  # the last frame that should be read
         # actual frame data (latest avaiable that should already be read)
         self.current_frame = None
+        self.source_frame = None  # current_frame before the stages
+        self.unchanged = False  # the last __next__ returned the same frame as the one before
+        self.stages = list(stages or [])
+        self.shown = -1  # number of the last returned frame
+
+        # Timing
+        self.realtime = realtime
+        self.clock = clock
+        self.sleep = sleep
+        self.start_time: "None | float" = None  # clock time of the first frame
 
         # Getting input
+        if (bytes_getter is None) == (readinto is None):
+            raise ValueError("Exactly one of bytes_getter and readinto must be given.")
         self.bytes_getter = bytes_getter
-        self.bytes_reader = BytesReader()
+        self.readinto = readinto
+        self.read_buffer = bytearray(buffer_size) if readinto is not None else None
+        self.stats: "None | ReaderStats" = ReaderStats() if stats else None
+        self.bytes_reader = BytesReader(self.stats, on_header, on_frame, on_parse_error, tolerant, user_sink)
+        self.tolerant = tolerant
+        self.bad_frame: "None | Frame" = None  # the last frame that could not be decoded
+
+        # Reading in a thread
+        self.threaded = threaded
+        self.thread: "None | threading.Thread" = None
+        self.lock = threading.Condition()  # guards frames and bytes_reader in threaded mode
+        self.error: "None | Exception" = None  # error that ended the thread
+        self.data_errors = deque()  # ValueErrors for invalid data found by the thread, raised once each
+        self.eof = False  # bytes_getter returned b"" (only detected in threaded mode)
+        self.closed = False
 
     def update(self):
+        if self.threaded:
+            if self.thread is None:
+                self.start()
+            with self.lock:
+                if self.data_errors:
+                    raise self.data_errors.popleft()
+                if self.error is not None:
+                    raise self.error
+            return
+
+        # complete frames that are already in the buffer are taken first, more input is read
+        # only if none of them is waiting for space (so "block" stops the producer)
+        self.try_read_frames()
+        if self.frames.space() == 0:
+            return
         self.update_buffer()
         if not self.header:
             self.try_read_header()
         self.try_read_frames()
 
+    def start(self):
+        """Starts the reading thread (threaded mode only)."""
+
+        if not self.threaded:
+            raise ValueError("Reader is not threaded.")
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._read_loop, name="DataReader", daemon=True)
+            self.thread.start()
+
+    def close(self, timeout: "None | float" = 1.0):
+        """Stops the reading thread. The thread can not be interrupted while it waits
+        in bytes_getter, it stops after bytes_getter returns (it is a daemon thread,
+        so it never keeps the program running)."""
+
+        with self.lock:
+            self.closed = True
+            self.lock.notify_all()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout)
+
+    def _read_loop(self):
+        try:
+            while True:
+                with self.lock:
+                    # frames that did not fit last time must be taken before reading more
+                    self._parse()
+                    while self.frames.space() == 0 and not self.closed:
+                        self.lock.wait()
+                        self._parse()
+                    if self.closed:
+                        return
+
+                data, size = self.read_input()
+                if not size:
+                    return
+
+                with self.lock:
+                    self.bytes_reader.read_more(data, size)
+                    self._parse()
+        except Exception as error:  # noqa: BLE001 - any error ends the thread and is raised in update
+            with self.lock:
+                self.error = error
+        finally:
+            with self.lock:
+                self.eof = True
+                self.lock.notify_all()
+
+    def _parse(self):
+        """Takes the header and frames from the buffer in the reading thread. Invalid data
+        is already removed when the ValueError is raised, so it is kept for update and
+        parsing goes on with the data after it."""
+
+        while True:
+            try:
+                if not self.header:
+                    self.try_read_header()
+                self.try_read_frames()
+                return
+            except ValueError as error:
+                self.data_errors.append(error)
+
+    def __enter__(self):
+        if self.threaded:
+            self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
     def update_buffer(self):
-        self.bytes_reader.read_more(self.bytes_getter())
+        data, size = self.read_input()
+        self.bytes_reader.read_more(data, size)
+
+    def read_input(self) -> "tuple[bytes | bytearray, int]":
+        """Reads the next chunk of input. Returns the data and its size (0 if there is no data)."""
+
+        buffer = self.read_buffer
+        if buffer is None:
+            data = self.bytes_getter() or b""  # type: ignore
+            return data, len(data)
+        # readinto can return None if there is no data in a non-blocking stream
+        return buffer, self.readinto(buffer) or 0  # type: ignore
 
     def user_print(self, flush=True, end=""):
-        self.bytes_reader.user_print(flush=flush, end=end)
+        with self.lock:
+            self.bytes_reader.user_print(flush=flush, end=end)
 
     def try_read_header(self):
         header = self.bytes_reader.try_get_header()
@@ -175,20 +698,126 @@ class DataReader:
         if not self.header:
             return
 
-        frames = self.bytes_reader.try_get_frames()
-        self.frames.extend(frames)
+        # frames are decoded in __next__, only if they are returned
+        while True:
+            space = self.frames.space()
+            frames = self.bytes_reader.try_get_frames(space, lazy=True)
+            self.frames.extend(frames)
+            # taking frames can make space for frames that were already consumed
+            if space is None or space == 0 or len(frames) < space:
+                break
+
+    @property
+    def lag(self) -> int:
+        """How many frames the producer is ahead of the frame that should be shown now.
+        Negative if the producer is late (frames that should be shown did not arrive yet)."""
+        return self.frames.end - self.frame_count
+
+    def wait_for_next_frame(self):
+        """Sleeps until it is time to show the next frame (according to fps from the header).
+        Returns immediately if the header or the first frame has not been read yet."""
+
+        if self.start_time is None or not self.fps:
+            return
+
+        next_time = self.start_time + self.frame_count / self.fps
+        # sleep can wake up early, so check again instead of spinning
+        remaining = next_time - self.clock()
+        while remaining > 0:
+            self.sleep(remaining)
+            remaining = next_time - self.clock()
 
     def __iter__(self):
         return self
 
-    def __next__(self):
+    def __next__(self) -> Frame:
         self.update()
 
-        self.frame_count += 1
-
-        if self.frames:
+        with self.lock:
+            frame = self._next_frame()
+
+        # the same frame again (nothing newer arrived or the pattern sent the same frame),
+        # it is already decoded and transformed
+        self.unchanged = frame is self.source_frame
+        if self.unchanged:
+            return self.current_frame  # type: ignore
+
+        # decoding is done outside of the lock, the frame is not shared
+        source = frame
+        if not frame.decoded:
+            frame = self.decode(frame)
+        self.source_frame = source
+        if frame is source:
+            # not a replacement for an invalid frame (that one was transformed already)
+            for stage in self.stages:
+                frame = stage(frame)
+        self.current_frame = frame
+        return frame
+
+    def decode(self, frame: Frame) -> Frame:
+        """Decodes a lazy frame. In tolerant mode an invalid frame is replaced by
+        the previous frame (black if there is none)."""
+
+        if frame is self.bad_frame:
+            # the same invalid frame is shown again (there is nothing newer)
+            return self.current_frame or Frame.black(self.led_count or 0)
+
+        stats = self.stats
+        start = perf_counter() if stats is not None else 0.0
+        try:
+            frame.decode()
+        except ValueError as error:
+            self.bytes_reader.parse_error(error)
+            if not self.tolerant:
+                raise
+            self.bad_frame = frame
+            return self.current_frame or Frame.black(self.led_count or 0)
+        if stats is not None:
+            stats.decode_time += perf_counter() - start
+        return frame
+
+    def _next_frame(self) -> Frame:
+        """Returns the frame that should be shown now (not decoded yet)."""
+
+        if self.start_time is None and self.frames:
+            self.start_time = self.clock()
+
+        if not self.realtime:
+            self.frame_count += 1
+        elif self.start_time is not None and self.fps:
+            self.frame_count = int((self.clock() - self.start_time) * self.fps) + 1
+
+        frames = self.frames
+        if frames:
             # best apporximation of the present
-            return self.frames[min(self.frame_count - 1, len(self.frames) - 1)]
-
+            number = min(self.frame_count - 1, frames.end - 1)
+            if number < frames.start:
+                # the frame was dropped, continue with the oldest one left
+                number = frames.start
+                self.frame_count = number + 1
+
+            if self.stats is not None:
+                self.update_stats(self.stats, number)
+            self.shown = number
+
+            frame = frames.get(number)
+            frames.consume(number + 1)
+            # the reading thread could be waiting for space
+            self.lock.notify_all()
+            return frame
+
+        if self.stats is not None:
+            self.update_stats(self.stats, self.shown)
         # if there are no frames, return black
-        return [(0, 0, 0)] * (self.led_count or 0)
+        return Frame.black(self.led_count or 0)
+
+    def update_stats(self, stats: ReaderStats, number: int):
+        """Updates stats when the frame with the given number is returned."""
+
+        frames = self.frames
+        stats.frames_returned += 1
+        # frames between the last returned frame and this one that were not dropped
+        stats.frames_skipped += max(number - max(self.shown + 1, frames.start), 0)
+        stats.frames_dropped = frames.dropped
+        stats.queue_size = len(frames)
+        stats.lag = self.lag
@@ -1,4 +1,11 @@
-from .utils import encode_header, encode_frame
+import binascii
+import os
+import sys
+import time
+
+from .utils import encode_header, encode_binary_frame, encode_compressed_frame, frame_to_bytes
+
+linesepb = os.linesep.encode(encoding="utf-8")
 
 
 class DataWriter:
@@ -9,32 +16,155 @@ class DataWriter:
         self,
         led_count: int = 500,
         fps: int = 60,
+        version: int = 0,
+        encodings: "None | list" = None,
+        stream=None,
+        buffer_size: int = 65536,
+        autoflush: bool = True,
+        paced: bool = False,
+        late_policy: str = "catch_up",
+        clock=time.monotonic,
+        sleep=time.sleep,
     ) -> None:
+        """version 1 writes frames as binary records. encodings is a list of frame encodings
+        ("delta", "rle", "repeat", see utils.ENCODINGS) that may be used in version 1.
+        For every frame the smallest of them is chosen.
+
+        stream is a binary stream (anything with write and flush), sys.stdout.buffer by default.
+        Data is collected in a buffer and written to the stream when there is more than
+        buffer_size bytes or after every frame if autoflush is True. Call flush (or use the
+        writer as a context manager) to write what is left. Text printed to sys.stdout is
+        flushed before the buffer, so user output and frames stay in order.
+
+        If paced is True, write_frame sleeps until it is time for the frame (according to fps
+        and clock) and flushes every frame. A frame that comes after its whole time slot has
+        passed is an overrun (this includes time spent waiting for a full pipe). late_policy
+        decides what to do with it:
+        - "catch_up": write it immediately, the next frames are written without waiting
+          until the writer is back on schedule,
+        - "drop": do not write it and skip to the time slot of the current time, so the frames
+          that are written stay on schedule,
+        - "reschedule": write it immediately and move the schedule, so there is no burst."""
+        if late_policy not in ("catch_up", "drop", "reschedule"):
+            raise ValueError(f"Unknown late_policy: {late_policy}.")
+
         # Header values
         self.fps = fps
         self.led_count = led_count
+        self.version = version
+        self.encodings = encodings
 
         # Endoded header
         self.header: str = encode_header(
             led_count=self.led_count,
             fps=self.fps,
+            version=self.version,
+            encodings=self.encodings,
         )
 
+        # Output
+        self.stream = stream
+        self.buffer = bytearray()
+        self.buffer_size = buffer_size
+        self.autoflush = autoflush
+
+        # Pacing
+        self.paced = paced
+        self.late_policy = late_policy
+        self.clock = clock
+        self.sleep = sleep
+        self.start_time: "None | float" = None  # clock time of the first frame
+        self.slot = 0  # time slot of the next frame
+        self.overruns = 0  # frames that came after their time slot
+        self.dropped_frames = 0  # late frames that were not written
+
         # State
         self.printed_header = False
         self.frame_count = 0
+        self.previous: "None | bytes" = None  # previous frame, needed for delta and repeat
 
-    def write_frame(self, frame: list):
-        """Writes a frame to stdout. Raises a ValueError if the frame 
-        does not have a valid shape (see encode_frame from utils).
+    def write_frame(self, frame) -> bool:
+        """Writes a frame to the stream. Raises a ValueError if the frame
+        does not have a valid shape (see frame_to_bytes from utils).
+        frame can be a list of rgb tuples, a Frame, bytes, bytearray, memoryview or a NumPy array.
 
         If the header has not been printed yet, it will be printed before the first frame.
-        Prefixes encoded frame and header with a "#".
+        Prefixes encoded frame and header with a "#". In version 1 frames are
+        written as binary records (see encode_binary_frame and encode_compressed_frame from utils).
+
+        Returns False if the frame was dropped because it was late (see late_policy).
         """
 
+        if self.paced and not self.wait_for_slot():
+            return False
+
         if not self.printed_header:
-            print("#" + self.header)
+            self.buffer += b"#" + self.header.encode(encoding="utf-8") + linesepb
             self.printed_header = True
 
-        print("#" + encode_frame(frame, self.led_count))
+        if self.version == 0:
+            self.buffer += b"#"
+            self.buffer += binascii.hexlify(frame_to_bytes(frame, self.led_count))
+            self.buffer += linesepb
+        elif self.encodings:
+            data = frame_to_bytes(frame, self.led_count)
+            self.buffer += encode_compressed_frame(data, self.led_count, self.previous, self.encodings)
+            self.previous = data
+        else:
+            self.buffer += encode_binary_frame(frame, self.led_count)
         self.frame_count += 1
+
+        if self.autoflush or self.paced or len(self.buffer) >= self.buffer_size:
+            self.flush()
+        return True
+
+    def wait_for_slot(self) -> bool:
+        """Sleeps until the time slot of the next frame. Returns False
+        if the frame is late and should be dropped."""
+
+        period = 1 / self.fps
+        now = self.clock()
+        start_time = self.start_time
+        if start_time is None:
+            start_time = self.start_time = now
+
+        due = start_time + self.slot * period
+        self.slot += 1
+
+        if now >= due + period:
+            self.overruns += 1
+            if self.late_policy == "drop":
+                # the next frame gets the slot we are in now, not the one after the dropped frame
+                self.dropped_frames += 1
+                self.slot = int((now - start_time) / period)
+                return False
+            if self.late_policy == "reschedule":
+                self.start_time = now - (self.slot - 1) * period
+            return True
+
+        # sleep can wake up early, so check again instead of spinning
+        remaining = due - now
+        while remaining > 0:
+            self.sleep(remaining)
+            remaining = due - self.clock()
+        return True
+
+    def flush(self):
+        """Writes the buffered data to the stream and flushes it."""
+
+        stream = self.stream
+        if stream is None:
+            # text printed with print must come out before the frames
+            sys.stdout.flush()
+            stream = sys.stdout.buffer
+
+        if self.buffer:
+            stream.write(self.buffer)
+            self.buffer.clear()
+        stream.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.flush()
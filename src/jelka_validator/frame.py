@@ -0,0 +1,137 @@
+"""The Frame class holds colors of all LEDs for a single frame.
+
+Colors are stored packed in a single bytes-like object as r, g, b, r, g, b, ...
+so a frame with n LEDs takes 3 * n bytes. Tuples of colors are only made when
+they are accessed. If NumPy is installed, the same memory can be viewed as a
+(led_count, 3) uint8 array through Frame.array.
+
+A frame can also be made lazily from an encoded line (see Frame.from_line).
+The line is then decoded the first time the colors are needed, so frames that
+are skipped never pay for decoding."""
+
+try:
+    import numpy
+except ImportError:  # NumPy is optional
+    numpy = None
+
+
+class Frame:
+    """Colors of all LEDs in a frame. Behaves like a read-only sequence of (r, g, b) tuples.
+    data is a bytes-like object (bytes, bytearray or memoryview) with 3 bytes per LED.
+
+    Examples:
+    >>> frame = Frame(bytes([0, 1, 2, 3, 4, 5]))
+    >>> len(frame)
+    2
+    >>> frame[-1]
+    (3, 4, 5)
+    >>> frame == [(0, 1, 2), (3, 4, 5)]
+    True
+    """
+
+    __slots__ = ("_data", "_led_count", "_line", "_version")
+
+    def __init__(self, data) -> None:
+        if len(data) % 3 != 0:
+            raise ValueError(f"Frame data must have 3 bytes per led, found {len(data)} bytes.")
+        self._data = data
+        self._line = None
+        self._led_count = len(data) // 3
+        self._version = None
+
+    @classmethod
+    def black(cls, led_count: int) -> "Frame":
+        """Returns a frame with all LEDs turned off."""
+        return cls(bytes(3 * led_count))
+
+    @classmethod
+    def from_line(cls, line: bytes, led_count: int, version: int) -> "Frame":
+        """Makes a frame that is decoded from line (without the "#" and the newline)
+        only when it is needed. The line is not checked here, decode_frame raises
+        a ValueError on first access if it is not valid.
+
+        Examples:
+        >>> frame = Frame.from_line(b"0001020304050096ff", 3, version=0)
+        >>> frame.decoded
+        False
+        >>> frame[2], frame.decoded
+        ((0, 150, 255), True)
+        """
+
+        frame = cls.__new__(cls)
+        frame._data = None
+        frame._line = line
+        frame._led_count = led_count
+        frame._version = version
+        return frame
+
+    @property
+    def data(self) -> "bytes | bytearray | memoryview":
+        """Packed r, g, b bytes of the frame."""
+        data = self._data
+        if data is None:
+            data = self._decode()
+        return data
+
+    @property
+    def decoded(self) -> bool:
+        return self._data is not None
+
+    def decode(self) -> "Frame":
+        """Decodes the line the frame was made from (if it was not decoded yet).
+        Raises a ValueError if the line is not valid. Returns the frame itself."""
+
+        if self._data is None:
+            self._decode()
+        return self
+
+    def _decode(self) -> "bytes | bytearray | memoryview":
+        from .utils import decode_frame
+
+        data = decode_frame(self._line, self._led_count, self._version).data  # type: ignore
+        self._data = data
+        self._line = None
+        return data
+
+    @property
+    def array(self):
+        """NumPy (led_count, 3) uint8 view of the frame data. No data is copied.
+        Raises an ImportError if NumPy is not installed."""
+
+        if numpy is None:
+            raise ImportError("NumPy is required for Frame.array.")
+        return numpy.frombuffer(self.data, dtype=numpy.uint8).reshape(-1, 3)
+
+    def tobytes(self) -> bytes:
+        return bytes(self.data)
+
+    def __len__(self) -> int:
+        return self._led_count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Frame index out of range.")
+
+        i = 3 * index
+        data = self.data
+        return (data[i], data[i + 1], data[i + 2])
+
+    def __iter__(self):
+        data = self.data
+        return zip(data[0::3], data[1::3], data[2::3])
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Frame):
+            return self.data == other.data
+        try:
+            return len(self) == len(other) and all(a == tuple(b) for a, b in zip(self, other))
+        except TypeError:
+            return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"Frame({list(self)!r})"
@@ -0,0 +1,138 @@
+"""The FrameQueue class stores frames that were read but are not necessarily shown yet.
+
+Frames are numbered from 0 (the first frame after the header). A frame keeps
+its number even after older frames are removed from the queue, so the reader
+can always ask for "frame number n" no matter how many frames were dropped.
+
+Frames that were consumed are removed right away, except the last consumed
+one (it can be shown again if nothing new arrives), so an unbounded queue
+only holds one frame more than it has to. The queue can be bounded. When it
+is full, the last consumed frame is removed too (unless it is the only
+frame). If that is not enough, the policy decides what happens:
+- "drop_oldest": the oldest frame is discarded to make space for the new one,
+- "latest": only the newest frame is kept, every older frame is discarded
+  (this policy ignores the capacity),
+- "block": new frames are not accepted until the consumer makes space,
+  the producer has to wait (see space)."""
+
+from collections import deque
+
+DROP_OLDEST = "drop_oldest"
+LATEST = "latest"
+BLOCK = "block"
+POLICIES = (DROP_OLDEST, LATEST, BLOCK)
+
+
+class FrameQueue:
+    """Ring buffer of frames with a configurable capacity and drop policy.
+    capacity None means the queue is unbounded (and the policy only matters for "latest").
+
+    Examples:
+    >>> queue = FrameQueue(capacity=2)
+    >>> queue.extend(["a", "b", "c"])
+    >>> list(queue), queue.start, queue.dropped
+    (['b', 'c'], 1, 1)
+    >>> queue.get(2)
+    'c'
+    """
+
+    def __init__(self, capacity: "None | int" = None, policy: str = DROP_OLDEST) -> None:
+        if capacity is not None and capacity < 1:
+            raise ValueError(f"capacity must be at least 1, found {capacity}.")
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown policy: {policy}, expected one of {POLICIES}.")
+
+        self.capacity = capacity
+        self.policy = policy
+
+        self.frames = deque()
+        self.start = 0  # number of the oldest stored frame
+        self.consumed = 0  # frames with lower numbers are no longer needed
+        self.dropped = 0  # frames that were discarded before they were consumed
+
+    @property
+    def end(self) -> int:
+        """Number of the next frame that will be appended (total frames appended)."""
+        return self.start + len(self.frames)
+
+    def space(self) -> "None | int":
+        """How many more frames can be appended before the producer has to wait.
+        None if it never has to (the policy is not "block" or there is no capacity)."""
+
+        if self.capacity is None or self.policy != BLOCK:
+            return None
+
+        self._release()
+        # the last consumed frame is kept only until a new frame comes, it does not take space
+        unconsumed = self.end - max(min(self.consumed, self.end), self.start)
+        return max(self.capacity - unconsumed, 0)
+
+    def append(self, frame) -> bool:
+        """Appends a frame. Returns False if the frame was not accepted
+        (only possible with the "block" policy)."""
+
+        if self.policy == LATEST:
+            self._discard(len(self.frames))
+        elif self.capacity is not None and len(self.frames) >= self.capacity:
+            # the new frame replaces the last consumed one
+            self._release(keep_last=False)
+            if len(self.frames) >= self.capacity:
+                if self.policy == BLOCK:
+                    return False
+                self._discard(len(self.frames) - self.capacity + 1)
+
+        self.frames.append(frame)
+        return True
+
+    def extend(self, frames):
+        for frame in frames:
+            self.append(frame)
+
+    def consume(self, number: int):
+        """Marks all frames with numbers lower than number as consumed. They are removed,
+        except the last of them, which is removed only when space is needed."""
+
+        self.consumed = max(self.consumed, number)
+        self._release(keep=1)
+
+    def get(self, number: int):
+        """Returns the frame with the given number. Raises an IndexError if it is not stored."""
+
+        if not self.start <= number < self.end:
+            raise IndexError(f"Frame {number} is not in the queue (has {self.start}-{self.end - 1}).")
+        return self.frames[number - self.start]
+
+    def clear(self):
+        self._discard(len(self.frames))
+
+    def _release(self, keep: int = 0, keep_last: bool = True):
+        # removes consumed frames, except the last keep of them
+        # the last frame is kept (unless a new one is appended), it is shown again if there is nothing new
+        while len(self.frames) > keep_last and self.start < self.consumed - keep:
+            self.frames.popleft()
+            self.start += 1
+
+    def _discard(self, count: int):
+        for _ in range(count):
+            self.frames.popleft()
+            if self.start >= self.consumed:
+                self.dropped += 1
+            self.start += 1
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+    def __getitem__(self, index):
+        return self.frames[index]
+
+    def __iter__(self):
+        return iter(self.frames)
+
+    def __eq__(self, other) -> bool:
+        try:
+            return list(self.frames) == list(other)
+        except TypeError:
+            return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"FrameQueue({list(self.frames)!r}, start={self.start}, dropped={self.dropped})"
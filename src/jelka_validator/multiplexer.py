@@ -0,0 +1,202 @@
+"""The Multiplexer class reads jelka data from many pattern processes at once.
+
+Every process writes to its own pipe. The pipes are non-blocking and are
+watched with a selector, so a single thread reads all of them and parses
+the bytes with a separate BytesReader for every stream. What was read is
+returned as events: (stream_id, kind, value) tuples, where kind is
+- "header": value is the header dict,
+- "frame": value is a decoded Frame,
+- "user": value is user output (bytes),
+- "error": value is the ValueError raised for invalid data, the process is
+  killed and nothing more is read from the stream,
+- "end": the stream has ended, value is the return code of the process.
+  A process that closes its stdout is given exit_timeout seconds to exit,
+  its "end" event comes when it has exited (or was killed).
+
+Non-blocking pipes only work with selectors on POSIX systems."""
+
+import os
+import selectors
+import subprocess
+import time
+
+from .datareader import BytesReader
+
+HEADER = "header"
+FRAME = "frame"
+USER = "user"
+ERROR = "error"
+END = "end"
+
+REAP_INTERVAL = 0.01  # seconds between checks of processes that are exiting
+
+
+class Stream:
+    """A pipe that is read by the multiplexer."""
+
+    def __init__(self, stream_id, fd: int, process: "None | subprocess.Popen" = None) -> None:
+        self.id = stream_id
+        self.fd = fd
+        self.process = process
+        self.bytes_reader = BytesReader()
+        self.header: "None | dict" = None
+        self.frame_count = 0
+
+
+class Multiplexer:
+    """Runs patterns and reads their output in a single thread. Use it as a context manager,
+    so the processes that are still running at the end are killed:
+
+        with Multiplexer() as mux:
+            for path in patterns:
+                mux.add_process([sys.executable, path], stream_id=path)
+            for stream_id, kind, value in mux.events(timeout=10):
+                ...
+    """
+
+    def __init__(self, chunk_size: int = 65536, exit_timeout: float = 1.0) -> None:
+        """exit_timeout is how long to wait for a process to exit after its stdout ends,
+        before it is killed."""
+        self.chunk_size = chunk_size
+        self.exit_timeout = exit_timeout
+        self.selector = selectors.DefaultSelector()
+        self.streams = {}  # streams that are still read, by id
+        self.exiting = []  # (stream id, process, deadline) of processes that closed stdout, but have not exited yet
+
+    def add_process(self, args, stream_id=None, **kwargs):
+        """Starts a process (other keyword arguments are passed to Popen) and reads its stdout.
+        stream_id defaults to the pid. Returns the stream id."""
+
+        process = subprocess.Popen(args, stdout=subprocess.PIPE, **kwargs)
+        if stream_id is None:
+            stream_id = process.pid
+        return self.add_stream(process.stdout.fileno(), stream_id, process)  # type: ignore
+
+    def add_stream(self, fd: int, stream_id, process: "None | subprocess.Popen" = None):
+        """Reads from a file descriptor (for example a pipe). The multiplexer makes it non-blocking
+        and closes it at the end. Returns the stream id."""
+
+        if stream_id in self.streams:
+            raise ValueError(f"Stream {stream_id!r} already exists.")
+
+        os.set_blocking(fd, False)
+        stream = Stream(stream_id, fd, process)
+        self.streams[stream_id] = stream
+        self.selector.register(fd, selectors.EVENT_READ, stream)
+        return stream_id
+
+    def poll(self, timeout: "None | float" = 0) -> list:
+        """Reads what is available and returns the events. Waits at most timeout seconds
+        for data (forever if None). Returns an empty list if there are no streams."""
+
+        if not self.streams and not self.exiting:
+            return []
+        if self.exiting:
+            # exited processes are found by polling, so do not wait for data for too long
+            timeout = REAP_INTERVAL if timeout is None else min(timeout, REAP_INTERVAL)
+
+        events = []
+        for key, _ in self.selector.select(timeout):
+            stream = key.data
+            try:
+                data = os.read(stream.fd, self.chunk_size)
+            except BlockingIOError:
+                continue
+
+            if not data:
+                self.remove(stream, events, kill=False)
+                continue
+
+            try:
+                self.parse(stream, data, events)
+            except ValueError as error:
+                events.append((stream.id, ERROR, error))
+                self.remove(stream, events)
+
+        self.reap(events)
+        return events
+
+    def parse(self, stream: Stream, data: bytes, events: list):
+        reader = stream.bytes_reader
+        reader.read_more(data)
+
+        if reader.user_buffer:
+            events.append((stream.id, USER, bytes(reader.user_buffer)))
+            reader.user_buffer.clear()
+
+        if stream.header is None:
+            stream.header = reader.try_get_header()
+            if stream.header is None:
+                return
+            events.append((stream.id, HEADER, stream.header))
+
+        # frames are decoded here, so invalid data is an "error" event and not a broken frame
+        for frame in reader.try_get_frames():
+            stream.frame_count += 1
+            events.append((stream.id, FRAME, frame))
+
+    def events(self, timeout: "None | float" = None):
+        """Yields events until all streams end. If timeout (seconds) is given,
+        the streams that are still open after it are closed (see close)."""
+
+        end_time = None if timeout is None else time.monotonic() + timeout
+        while self.streams or self.exiting:
+            remaining = None if end_time is None else end_time - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                yield from self.close()
+                return
+            yield from self.poll(remaining)
+
+    def remove(self, stream: Stream, events: list, kill: bool = True):
+        """Stops reading a stream and kills its process. Adds the "end" event to events.
+        If kill is False, the process is given exit_timeout seconds to exit (see reap)."""
+
+        self.selector.unregister(stream.fd)
+        del self.streams[stream.id]
+
+        process = stream.process
+        if process is None:
+            os.close(stream.fd)
+            events.append((stream.id, END, None))
+            return
+
+        process.stdout.close()  # type: ignore
+        if not kill:
+            # the process closed its stdout, it should exit soon
+            self.exiting.append((stream.id, process, time.monotonic() + self.exit_timeout))
+            return
+        if process.poll() is None:
+            process.kill()
+        events.append((stream.id, END, process.wait()))
+
+    def reap(self, events: list, kill: bool = False):
+        """Adds the "end" events of exiting processes that have exited. Processes that are
+        still running after their exit_timeout (all of them if kill is True) are killed.
+        Never waits for a process that is running."""
+
+        now = time.monotonic()
+        exiting = []
+        for stream_id, process, deadline in self.exiting:
+            if process.poll() is None:
+                if not kill and now < deadline:
+                    exiting.append((stream_id, process, deadline))
+                    continue
+                process.kill()
+            events.append((stream_id, END, process.wait()))
+        self.exiting = exiting
+
+    def close(self) -> list:
+        """Kills all processes and stops reading. Returns the "end" events."""
+
+        events = []
+        for stream in list(self.streams.values()):
+            self.remove(stream, events)
+        self.reap(events, kill=True)
+        return events
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+        self.selector.close()
@@ -0,0 +1,156 @@
+"""Estimation and limiting of the current drawn by LEDs.
+
+The current of a frame is estimated with a linear model: every LED draws
+idle_ma when it is off, and every channel adds up to channel_ma[c] at value
+255. So only the (weighted) sums of the channel values are needed. If NumPy
+is installed, they are computed as a single dot product of the packed frame
+data with a cached vector of weights, otherwise with sum() over strided slices.
+
+PowerLimiter is a stage for DataReader (see DataReader stages). If a frame
+(or a segment of it) needs more current than its budget, the values are
+scaled down with a lookup table and bytes.translate, in a single pass.
+Scaled values are rounded down, so a limited frame never exceeds the budget.
+It should be the last stage, after the values are gamma corrected."""
+
+try:
+    import numpy
+except ImportError:  # NumPy is optional
+    numpy = None
+
+from .frame import Frame
+
+STEPS = 1024  # scale factors are rounded down to multiples of 1 / STEPS
+
+
+class PowerLimiter:
+    """Limits the estimated current (in mA) of frames to budget_ma and of segments to their budgets.
+    segments is a list of (start, stop, budget_ma) tuples, where start and stop are LED indices
+    (like in range), segments must not overlap. channel_ma are the mA of the channels in the order of the frame data.
+
+    frames counts the frames that were checked and limited the frames that had to be scaled down.
+
+    Examples:
+    >>> limiter = PowerLimiter(budget_ma=40, channel_ma=(20, 20, 20), idle_ma=0)
+    >>> limiter.current(bytes([255, 255, 255]))
+    60.0
+    >>> limiter(Frame(bytes([255, 255, 255, 0, 0, 0])))
+    Frame([(169, 169, 169), (0, 0, 0)])
+    >>> limiter.frames, limiter.limited
+    (1, 1)
+    """
+
+    def __init__(
+        self,
+        budget_ma: "None | float" = None,
+        segments: "None | list" = None,
+        channel_ma: tuple = (20, 20, 20),
+        idle_ma: float = 1.0,
+    ) -> None:
+        if len(channel_ma) != 3:
+            raise ValueError(f"channel_ma must have 3 values, found {len(channel_ma)}.")
+        self.budget_ma = budget_ma
+        self.segments = list(segments or [])
+        for start, stop, _ in self.segments:
+            if not 0 <= start <= stop:
+                raise ValueError(f"Invalid segment from {start} to {stop}.")
+        self.channel_ma = tuple(channel_ma)
+        self.idle_ma = idle_ma
+
+        self.tables = {}  # lookup tables by the scale step
+        self._weights = None  # mA of every byte at value 1, for NumPy
+        self.frames = 0
+        self.limited = 0
+        self.last_current = 0.0  # estimated current of the last frame before limiting
+        self.max_current = 0.0
+
+    def reset(self):
+        self.frames = 0
+        self.limited = 0
+        self.last_current = 0.0
+        self.max_current = 0.0
+
+    def channel_current(self, data) -> float:
+        """Current of the channels (without idle current) for packed r, g, b data."""
+
+        ma = self.channel_ma
+        if numpy is not None:
+            values = numpy.frombuffer(data, dtype=numpy.uint8)
+            return float(values @ self.weights(len(values)))
+        if ma[0] == ma[1] == ma[2]:
+            return sum(data) * ma[0] / 255
+        return (sum(data[0::3]) * ma[0] + sum(data[1::3]) * ma[1] + sum(data[2::3]) * ma[2]) / 255
+
+    def weights(self, size: int):
+        weights = self._weights
+        if weights is None or len(weights) < size:
+            weights = self._weights = numpy.tile(numpy.array(self.channel_ma, dtype=float) / 255, (size + 2) // 3)  # type: ignore
+        return weights[:size]
+
+    def current(self, data) -> float:
+        """Estimated current of packed r, g, b data in mA."""
+        return self.idle_ma * (len(data) // 3) + self.channel_current(data)
+
+    def scale(self, budget: float, idle: float, channels: float) -> float:
+        """Factor for the channel current so that idle + channels fits into budget."""
+
+        if idle + channels <= budget:
+            return 1.0
+        if budget <= idle:
+            return 0.0
+        return (budget - idle) / channels
+
+    def table(self, factor: float) -> bytes:
+        step = int(factor * STEPS)
+        table = self.tables.get(step)
+        if table is None:
+            table = self.tables[step] = bytes(value * step // STEPS for value in range(256))
+        return table
+
+    def apply(self, data) -> "tuple[bytes, bool]":
+        """Limits packed r, g, b data. Returns the data (the same object if nothing
+        was changed) and whether it was limited."""
+
+        data = bytes(data)
+        view = memoryview(data)
+        idle_ma = self.idle_ma
+        parts = []  # (start, stop, scale factor) in bytes
+        limited_channels = 0.0  # channel current of segments after scaling
+        segment_channels = 0.0  # channel current of segments before scaling
+        for start, stop, budget in self.segments:
+            part = view[3 * start : 3 * stop]
+            channels = self.channel_current(part)
+            factor = self.scale(budget, idle_ma * (len(part) // 3), channels)
+            parts.append((3 * start, 3 * stop, factor))
+            segment_channels += channels
+            limited_channels += factor * channels
+
+        channels = self.channel_current(data)
+        idle = idle_ma * (len(data) // 3)
+        self.last_current = idle + channels
+        total = 1.0
+        if self.budget_ma is not None:
+            total = self.scale(self.budget_ma, idle, channels - segment_channels + limited_channels)
+
+        if total >= 1 and all(factor >= 1 for _, _, factor in parts):
+            return data, False
+
+        out = data.translate(self.table(total)) if total < 1 else data
+        if any(factor < 1 for _, _, factor in parts):
+            out = bytearray(out)
+            for start, stop, factor in parts:
+                if factor < 1:
+                    out[start:stop] = data[start:stop].translate(self.table(factor * total))
+            out = bytes(out)
+        return out, True
+
+    def __call__(self, frame: Frame) -> Frame:
+        self.frames += 1
+        data, limited = self.apply(frame.data)
+        self.max_current = max(self.max_current, self.last_current)
+        if not limited:
+            return frame
+        self.limited += 1
+        return Frame(data)
+
+    def __repr__(self) -> str:
+        return f"PowerLimiter(budget_ma={self.budget_ma}, segments={self.segments}, limited={self.limited}/{self.frames})"
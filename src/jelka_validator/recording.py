@@ -0,0 +1,208 @@
+"""Recording jelka data to files and replaying it with random access.
+
+A recording is a normal jelka stream (the header and a record or a line for
+every frame), so it can still be read with DataReader. Next to it, in a file
+with the same name and the ".idx" suffix, is the frame index: the offset of
+every frame in the stream as an 8 byte little-endian unsigned integer.
+
+Recorder writes every frame in full (a raw record in version 1), never as a
+delta or a repeat, so any frame can be decoded without the frames before it.
+Replay maps both files into memory (mmap) and decodes frames straight from
+the mapped stream, so seeking anywhere in a recording of any size takes
+constant time and only the pages that are used are ever read."""
+
+import mmap
+import os
+from contextlib import ExitStack
+
+from .frame import Frame
+from .utils import (
+    RECORD_HEADER_SIZE,
+    RECORD_RAW,
+    decode_frame,
+    decode_header,
+    encode_binary_frame,
+    encode_frame,
+    encode_header,
+    record_length,
+)
+
+INDEX_SUFFIX = ".idx"
+INDEX_ENTRY_SIZE = 8
+
+linesepb = os.linesep.encode(encoding="utf-8")
+
+
+class Recorder:
+    """Writes frames to a recording file and its index. Use it as a context manager
+    or call close when done:
+
+        with Recorder("show.jelka", led_count=500, fps=60) as recorder:
+            for frame in reader:
+                recorder.write_frame(frame)
+    """
+
+    def __init__(self, path: str, led_count: int, fps: int, version: int = 1) -> None:
+        """version 0 writes frames as hex lines, version 1 as raw binary records."""
+
+        self.path = path
+        self.led_count = led_count
+        self.fps = fps
+        self.version = version
+        self.frame_count = 0
+
+        header = encode_header(led_count=led_count, fps=fps, version=version)
+        # if anything fails, the files that were already opened are closed
+        with ExitStack() as stack:
+            self.file = stack.enter_context(open(path, "wb"))
+            self.index = stack.enter_context(open(path + INDEX_SUFFIX, "wb"))
+            self.file.write(b"#" + header.encode(encoding="utf-8") + linesepb)
+            stack.pop_all()
+        self.offset = self.file.tell()  # where the next frame is written
+
+    def write_frame(self, frame):
+        """Writes a frame. Accepts the same frames as DataWriter.write_frame."""
+
+        if self.version == 0:
+            data = b"#" + encode_frame(frame, self.led_count).encode(encoding="utf-8") + linesepb
+        else:
+            data = encode_binary_frame(frame, self.led_count)
+
+        self.file.write(data)
+        self.index.write(self.offset.to_bytes(INDEX_ENTRY_SIZE, byteorder="little"))
+        self.offset += len(data)
+        self.frame_count += 1
+
+    def flush(self):
+        # the stream first, so the index never points past the end of it
+        self.file.flush()
+        self.index.flush()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+        self.index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class Replay:
+    """Random access to a recording made with Recorder. Frames are numbered from 0.
+    Iterating returns frames from the current position on (see seek), like DataReader.
+
+    If loop is True, iteration starts again at the first frame after the last one,
+    otherwise it stops."""
+
+    def __init__(self, path: str, loop: bool = False) -> None:
+        self.path = path
+        self.loop = loop
+        self.position = 0  # number of the next frame returned by __next__
+        self.index = None
+        self.frame_count = 0
+
+        with open(path, "rb") as file:
+            self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self.open_index()
+        except BaseException:
+            self.close()
+            raise
+
+    def open_index(self):
+        """Reads the header and maps the frame index."""
+
+        path = self.path
+        header_end = self.data.find(b"\n")
+        if self.data[:1] != b"#" or header_end == -1:
+            raise ValueError(f"{path} does not start with a header.")
+        self.header = decode_header(self.data[1:header_end].decode(encoding="utf-8").strip())
+        self.version = self.header["version"]
+        self.led_count = self.header["led_count"]
+        self.fps = self.header["fps"]
+
+        if os.path.getsize(path + INDEX_SUFFIX):
+            with open(path + INDEX_SUFFIX, "rb") as file:
+                self.index = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.frame_count = len(self.index) // INDEX_ENTRY_SIZE
+
+            # a recording that was not closed can have entries for frames that were not written
+            while self.frame_count and self.offset(self.frame_count - 1) >= len(self.data):
+                self.frame_count -= 1
+
+    def offset(self, number: int) -> int:
+        """Offset of the frame with the given number in the recording."""
+
+        start = number * INDEX_ENTRY_SIZE
+        return int.from_bytes(self.index[start : start + INDEX_ENTRY_SIZE], byteorder="little")  # type: ignore
+
+    def get(self, number: int) -> Frame:
+        """Returns the frame with the given number. Negative numbers count from the end.
+        Raises an IndexError if there is no such frame and a ValueError if it is not valid."""
+
+        if number < 0:
+            number += self.frame_count
+        if not 0 <= number < self.frame_count:
+            raise IndexError(f"Frame {number} is not in the recording (has {self.frame_count} frames).")
+
+        data = self.data
+        start = self.offset(number)
+        if self.version == 0:
+            end = data.find(linesepb, start)
+            if end == -1:
+                raise ValueError(f"Frame {number} is not complete.")
+            return decode_frame(data[start + 1 : end], self.led_count, self.version)
+
+        if data[start + 1] != RECORD_RAW:
+            raise ValueError(f"Frame {number} is not a raw record.")
+        # the payload is copied from the mapped file once and used as is
+        payload = data[start + RECORD_HEADER_SIZE : start + RECORD_HEADER_SIZE + 3 * self.led_count]
+        length = record_length(data[start : start + RECORD_HEADER_SIZE], 0)
+        if len(payload) != 3 * self.led_count or length != RECORD_HEADER_SIZE + len(payload):
+            raise ValueError(f"Frame {number} is not complete or has a wrong size.")
+        return Frame(payload)
+
+    def seek(self, number: int):
+        """Moves to the frame with the given number (clamped to the recording)."""
+        self.position = min(max(number, 0), self.frame_count)
+
+    def seek_time(self, seconds: float):
+        """Moves to the frame that is shown seconds after the start (according to fps)."""
+        self.seek(int(seconds * self.fps))
+
+    def tell_time(self) -> float:
+        """Time of the next frame in seconds."""
+        return self.position / self.fps
+
+    def close(self):
+        self.data.close()
+        if self.index is not None:
+            self.index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self) -> int:
+        return self.frame_count
+
+    def __getitem__(self, number: int) -> Frame:
+        return self.get(number)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> Frame:
+        if self.position >= self.frame_count:
+            if not self.loop or not self.frame_count:
+                raise StopIteration
+            self.position = 0
+
+        frame = self.get(self.position)
+        self.position += 1
+        return frame
@@ -0,0 +1,119 @@
+"""Conversion of frame streams between frame rates.
+
+A pattern sends frames at the fps from its header, but the LEDs may be
+refreshed at a different rate. Resampler takes source frames from an iterator
+(usually a DataReader that is not in realtime mode, so every next gives the
+next frame) and returns frames at target_fps. For output frame k at time
+k / target_fps it finds the position in the source, for example 2.5 is half
+way between source frames 2 and 3, and depending on mode returns
+- "hold": the last source frame that started (frame 2),
+- "nearest": the nearest source frame (frame 3),
+- "linear": a crossfade of the two frames (half of each).
+
+Crossfades are computed over the whole frame data at once with NumPy (or in
+a plain Python loop if NumPy is not installed). A frame that falls exactly on
+a source frame is returned without copying, so a 30 fps pattern shown at 60 fps
+only needs a crossfade for every second frame. Linear mode has to know the
+next source frame, so it shows frames one source frame later."""
+
+try:
+    import numpy
+except ImportError:  # NumPy is optional
+    numpy = None
+
+from .frame import Frame
+
+HOLD = "hold"
+NEAREST = "nearest"
+LINEAR = "linear"
+MODES = (HOLD, NEAREST, LINEAR)
+
+
+def crossfade(a, b, weight: float) -> bytes:
+    """Mixes packed r, g, b data: (1 - weight) of a and weight of b. weight is rounded to 1/256.
+
+    Examples:
+    >>> crossfade(bytes([0, 100, 255]), bytes([255, 200, 255]), 0.5)
+    b'\\x80\\x96\\xff'
+    """
+
+    if len(a) != len(b):
+        raise ValueError(f"Frames have different sizes: {len(a)} and {len(b)} bytes.")
+    wb = round(weight * 256)
+    wa = 256 - wb
+    if numpy is not None:
+        mixed = numpy.frombuffer(a, dtype=numpy.uint8).astype(numpy.uint16)
+        mixed *= wa
+        mixed += numpy.frombuffer(b, dtype=numpy.uint8).astype(numpy.uint16) * numpy.uint16(wb)
+        mixed += 128
+        mixed >>= 8
+        return mixed.astype(numpy.uint8).tobytes()
+    return bytes((x * wa + y * wb + 128) >> 8 for x, y in zip(a, b))
+
+
+class Resampler:
+    """Iterator of frames at target_fps made from the frames of another iterator.
+    source_fps is taken from frames.fps (the header of a DataReader) if it is not given.
+    Until it is known, the source frames are returned as they are (a DataReader knows it
+    after the header is read, usually in the same next that returns the first frame).
+
+    Examples:
+    >>> source = iter([Frame(bytes([0, 0, 0])), Frame(bytes([100, 100, 100])), Frame(bytes([200, 200, 200]))])
+    >>> resampler = Resampler(source, target_fps=60, source_fps=30)
+    >>> [next(resampler)[0] for _ in range(4)]
+    [(0, 0, 0), (50, 50, 50), (100, 100, 100), (150, 150, 150)]
+    """
+
+    def __init__(self, frames, target_fps: float, source_fps: "None | float" = None, mode: str = LINEAR) -> None:
+        if mode not in MODES:
+            raise ValueError(f"Unknown mode: {mode}, expected one of {MODES}.")
+        if target_fps <= 0:
+            raise ValueError(f"target_fps must be positive, found {target_fps}.")
+        self.frames = frames
+        self.target_fps = target_fps
+        self.source_fps = source_fps
+        self.mode = mode
+
+        self.start = 0  # source frame of output frame 0
+        self.count = 0  # frames returned since start
+        self.index = -1  # number of the newest source frame
+        self.newer: "None | Frame" = None  # source frame index
+        self.older: "None | Frame" = None  # source frame index - 1
+        self.blended = 0  # frames that were crossfaded
+
+    def source(self, number: int) -> Frame:
+        """Returns source frame number (it must be the newest or the one before it)."""
+
+        while self.index < number:
+            self.older, self.newer = self.newer, next(self.frames)
+            self.index += 1
+        return self.newer if number == self.index else self.older  # type: ignore
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> Frame:
+        fps = self.source_fps or getattr(self.frames, "fps", None)
+        if not fps:
+            # positions are counted from the last frame returned before fps is known
+            self.start, self.count = self.index + 1, 1
+            return self.source(self.start)
+
+        position = self.start + self.count * fps / self.target_fps
+        self.count += 1
+        number = int(position)
+        if self.mode == HOLD:
+            return self.source(number)
+        if self.mode == NEAREST:
+            return self.source(int(position + 0.5))
+
+        weight = position - number
+        if weight == 0:
+            return self.source(number)
+        b = self.source(number + 1)
+        a = self.source(number)
+        if len(a) != len(b):
+            # the first frames (before any data arrived) can be empty
+            return b
+        self.blended += 1
+        return Frame(crossfade(a.data, b.data, weight))
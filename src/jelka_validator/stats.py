@@ -0,0 +1,62 @@
+"""The ReaderStats class collects counters and timings of reading jelka data.
+
+Statistics are off by default. When they are on (DataReader(stats=True)),
+BytesReader and DataReader update a single shared ReaderStats object: a few
+integer additions and two time.perf_counter calls per chunk, per batch of
+parsed frames and per decoded frame, so they can be left on during shows.
+
+The counters help to find where a stutter comes from:
+- the pattern process is slow: lag is negative, frames_parsed grows slowly,
+- the pipe is slow: bytes_read grows slowly, but read_time is small,
+- parsing is slow: read_time, parse_time or decode_time grow as fast as the clock,
+- the display is slow: lag grows, frames are skipped or dropped."""
+
+
+class ReaderStats:
+    """Counters and timings of a reader. Times are in seconds (time.perf_counter).
+
+    Examples:
+    >>> stats = ReaderStats()
+    >>> stats.bytes_read += 10
+    >>> stats.as_dict()["bytes_read"]
+    10
+    >>> stats.reset()
+    >>> stats.bytes_read
+    0
+    """
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self):
+        """Sets all counters and timings to zero."""
+
+        # Input
+        self.bytes_read = 0
+        self.chunks_read = 0  # calls of read_more with data
+
+        # Frames
+        self.frames_parsed = 0  # frames taken from the buffer (not necessarily decoded)
+        self.frames_returned = 0  # calls of __next__
+        self.frames_skipped = 0  # frames consumed without being returned (realtime mode)
+        self.frames_dropped = 0  # frames discarded by the queue policy
+        self.parse_errors = 0
+
+        # Buffers (bytes) and the queue (frames) after the last update
+        self.jelka_buffer_size = 0
+        self.user_buffer_size = 0
+        self.max_jelka_buffer_size = 0
+        self.queue_size = 0
+        self.lag = 0  # see DataReader.lag
+
+        # Time spent in read_more, try_get_frames and decoding frames
+        self.read_time = 0.0
+        self.parse_time = 0.0
+        self.decode_time = 0.0
+
+    def as_dict(self) -> dict:
+        return dict(self.__dict__)
+
+    def __repr__(self) -> str:
+        values = ", ".join(f"{key}={value!r}" for key, value in self.__dict__.items())
+        return f"ReaderStats({values})"
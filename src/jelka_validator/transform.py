@@ -0,0 +1,104 @@
+"""Output transforms that prepare frames for LED drivers.
+
+OutputTransform applies gamma correction and brightness to every value and
+reorders the channels (many LED strips expect g, r, b instead of r, g, b).
+Gamma and brightness are combined into a single 256-entry lookup table, so a
+frame is transformed with one bytes.translate call over the packed frame data
+and (if the order is not rgb) three strided slice copies. No per-LED objects
+are made. The table is rebuilt only when gamma or brightness change.
+
+A transform is a stage for DataReader (see DataReader stages):
+
+    reader = DataReader(sys.stdin.buffer.read1, stages=[OutputTransform(gamma=2.2, brightness=0.5, order="grb")])"""
+
+from .frame import Frame
+
+CHANNELS = "rgb"
+IDENTITY = bytes(range(256))
+
+
+class OutputTransform:
+    """Maps every value v (0-255) to round(255 * brightness * (v / 255) ** gamma)
+    and writes the channels of every LED in the given order.
+
+    Examples:
+    >>> transform = OutputTransform(brightness=0.5, order="grb")
+    >>> transform(Frame(bytes([255, 100, 0, 2, 4, 6])))
+    Frame([(50, 128, 0), (2, 1, 3)])
+    >>> transform.gamma = 2.0
+    >>> transform.apply(bytes([255, 100, 0]))
+    b'\\x14\\x80\\x00'
+    """
+
+    def __init__(self, gamma: float = 1.0, brightness: float = 1.0, order: str = CHANNELS) -> None:
+        self._table: "None | bytes" = None
+        self.gamma = gamma
+        self.brightness = brightness
+        self.order = order
+
+    @property
+    def gamma(self) -> float:
+        return self._gamma
+
+    @gamma.setter
+    def gamma(self, gamma: float):
+        if gamma <= 0:
+            raise ValueError(f"gamma must be positive, found {gamma}.")
+        self._gamma = gamma
+        self._table = None
+
+    @property
+    def brightness(self) -> float:
+        return self._brightness
+
+    @brightness.setter
+    def brightness(self, brightness: float):
+        if not 0 <= brightness <= 1:
+            raise ValueError(f"brightness must be between 0 and 1, found {brightness}.")
+        self._brightness = brightness
+        self._table = None
+
+    @property
+    def order(self) -> str:
+        return self._order
+
+    @order.setter
+    def order(self, order: str):
+        order = order.lower()
+        if sorted(order) != sorted(CHANNELS):
+            raise ValueError(f"order must be a permutation of {CHANNELS!r}, found {order!r}.")
+        self._order = order
+        # for every output channel, the input channel it is copied from
+        self._sources = [CHANNELS.index(channel) for channel in order]
+
+    @property
+    def table(self) -> "None | bytes":
+        """The lookup table for values (None if it does not change them)."""
+
+        if self._table is None:
+            self._table = self.make_table(self._gamma, self._brightness)
+        return self._table if self._table != IDENTITY else None
+
+    @staticmethod
+    def make_table(gamma: float, brightness: float) -> bytes:
+        return bytes(round(255 * brightness * (value / 255) ** gamma) for value in range(256))
+
+    def apply(self, data) -> bytes:
+        """Transforms packed r, g, b data (any bytes-like object). Returns new bytes."""
+
+        table = self.table
+        data = bytes(data).translate(table) if table is not None else bytes(data)
+        if self._order == CHANNELS:
+            return data
+
+        out = bytearray(data)
+        for channel, source in enumerate(self._sources):
+            if channel != source:
+                out[channel::3] = data[source::3]
+        return bytes(out)
+
+    def __call__(self, frame: Frame) -> Frame:
+        return Frame(self.apply(frame.data))
+
+    def __repr__(self) -> str:
+        return f"OutputTransform(gamma={self._gamma}, brightness={self._brightness}, order={self._order!r})"
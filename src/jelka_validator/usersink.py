@@ -0,0 +1,144 @@
+"""Sinks for user output (everything a pattern prints that is not jelka data).
+
+By default BytesReader keeps user output in user_buffer until user_print is
+called. If nobody calls it, the buffer grows for as long as the pattern runs.
+A sink instead takes the output as soon as it is read:
+- CallbackSink passes the text to a function,
+- FileSink writes it to a text file (sys.stdout by default),
+- RingSink keeps only the last lines and counts the ones it had to drop.
+
+Sinks decode the bytes with an incremental UTF-8 decoder, so a character
+split between two reads is decoded correctly. Invalid bytes are replaced
+with U+FFFD. With lines=True the text is delivered one complete line at a
+time; a line that gets longer than max_line_length is delivered in parts,
+so a pattern that never prints a newline can not fill the memory either."""
+
+import codecs
+import sys
+from abc import ABC, abstractmethod
+from collections import deque
+
+
+class UserSink(ABC):
+    """Base class of sinks. Subclasses implement deliver(text)."""
+
+    def __init__(self, lines: bool = False, max_line_length: int = 65536) -> None:
+        self.lines = lines
+        self.max_line_length = max_line_length
+        self.decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self.pending = ""  # the start of a line that has not ended yet (lines mode only)
+
+    def write(self, data: bytes):
+        text = self.decoder.decode(data)
+        if not self.lines:
+            if text:
+                self.deliver(text)
+            return
+
+        text = self.pending + text
+        start = 0
+        end = text.find("\n")
+        while end != -1:
+            self.deliver(text[start : end + 1])
+            start = end + 1
+            end = text.find("\n", start)
+        text = text[start:]
+        while len(text) > self.max_line_length:
+            self.deliver(text[: self.max_line_length])
+            text = text[self.max_line_length :]
+        self.pending = text
+
+    def flush(self):
+        """Delivers what is left, including a line without a newline at the end."""
+
+        text = self.pending + self.decoder.decode(b"", final=True)
+        self.pending = ""
+        if text:
+            self.deliver(text)
+
+    @abstractmethod
+    def deliver(self, text: str):
+        """Takes decoded text (a whole line if lines is True)."""
+
+
+class CallbackSink(UserSink):
+    """Calls callback with the text (every line separately if lines is True).
+
+    Examples:
+    >>> lines = []
+    >>> sink = CallbackSink(lines.append, lines=True)
+    >>> sink.write("a\\nb\\nč".encode()[:-1])
+    >>> sink.write("č\\n".encode()[1:])
+    >>> lines
+    ['a\\n', 'b\\n', 'č\\n']
+    """
+
+    def __init__(self, callback, lines: bool = False, max_line_length: int = 65536) -> None:
+        super().__init__(lines, max_line_length)
+        self.callback = callback
+
+    def deliver(self, text: str):
+        self.callback(text)
+
+
+class FileSink(UserSink):
+    """Writes the text to file, a text stream (sys.stdout by default). The file is flushed
+    after every write if flush is True."""
+
+    def __init__(self, file=None, flush: bool = True, lines: bool = False, max_line_length: int = 65536) -> None:
+        super().__init__(lines, max_line_length)
+        self.file = file
+        self.autoflush = flush
+
+    def write(self, data: bytes):
+        super().write(data)
+        if self.autoflush:
+            self._file().flush()
+
+    def flush(self):
+        super().flush()
+        self._file().flush()
+
+    def deliver(self, text: str):
+        self._file().write(text)
+
+    def _file(self):
+        # sys.stdout is looked up every time, it can be replaced (for example by pytest)
+        return self.file if self.file is not None else sys.stdout
+
+
+class RingSink(UserSink):
+    """Keeps the last capacity lines. truncated counts the lines that were dropped.
+
+    Examples:
+    >>> sink = RingSink(capacity=2)
+    >>> sink.write(b"1\\n2\\n3\\n4")
+    >>> sink.text(), sink.truncated
+    ('2\\n3\\n', 1)
+    >>> sink.flush()
+    >>> sink.pop(), sink.truncated
+    (['3\\n', '4'], 2)
+    >>> sink.text()
+    ''
+    """
+
+    def __init__(self, capacity: int = 1000, max_line_length: int = 65536) -> None:
+        super().__init__(lines=True, max_line_length=max_line_length)
+        self.ring = deque(maxlen=capacity)
+        self.truncated = 0
+
+    def deliver(self, text: str):
+        if len(self.ring) == self.ring.maxlen:
+            self.truncated += 1
+        self.ring.append(text)
+
+    def text(self) -> str:
+        """Returns the lines that are kept."""
+        return "".join(self.ring)
+
+    def pop(self) -> list:
+        """Returns the lines that are kept and removes them."""
+
+        lines = list(self.ring)
+        self.ring.clear()
+        return lines
@@ -1,31 +1,82 @@
 """This module contains functions for encoding and decoding the header and frames."""
 
+import binascii
 import json
+from itertools import chain
 
+try:
+    import numpy
+except ImportError:  # NumPy is optional
+    numpy = None
 
-def encode_header(led_count: int, fps: int) -> str:
-    """led_count must be an integer.
+from .frame import Frame
+
+# Supported versions of the data format
+VERSIONS = (0, 1)
+
+# Version 1 frames are binary records: "#", a record type byte, the length
+# of the payload as a 4 byte big-endian unsigned integer and the payload.
+# Record types are bytes below 0x20 (but not newlines), so they can never
+# be confused with a text line (a header or a version 0 frame).
+RECORD_HEADER_SIZE = 6
+RECORD_RAW = 0x01  # payload has raw r, g, b bytes for every led
+RECORD_DELTA = 0x02  # payload has spans of leds that changed since the previous frame
+RECORD_RLE = 0x03  # payload has runs of leds with the same color
+RECORD_REPEAT = 0x04  # no payload, the previous frame is shown again
+RECORD_TYPES = bytes((RECORD_RAW, RECORD_DELTA, RECORD_RLE, RECORD_REPEAT))
+
+# Names of record types (frame encodings) used in the "encodings" key of the header
+ENCODINGS = {"raw": RECORD_RAW, "delta": RECORD_DELTA, "rle": RECORD_RLE, "repeat": RECORD_REPEAT}
+
+# A delta span is the index of the first led (4 bytes), the number of leds (2 bytes)
+# and their colors. An rle run is the number of leds (2 bytes) and their color.
+DELTA_SPAN_HEADER_SIZE = 6
+RLE_RUN_SIZE = 5
+MAX_RUN = 0xFFFF
+# No record needs more payload bytes per led than a delta with a span for every led,
+# a longer record has a corrupt length
+MAX_PAYLOAD_PER_LED = DELTA_SPAN_HEADER_SIZE + 3
+
+NONZERO = bytes([0]) + bytes([1]) * 255  # translation table: 0 stays 0, everything else becomes 1
+
+
+def encode_header(led_count: int, fps: int, version: int = 0, encodings: "None | list" = None) -> str:
+    """led_count must be an integer. version 0 sends frames as hex text lines,
+    version 1 as binary records (see encode_binary_frame).
+
+    In version 1 the header can also list the frame encodings the writer may use
+    (names from ENCODINGS). Without the list only "raw" frames are allowed.
 
     Examples:
     >>> encode_header(led_count=500, fps=60)
     '{"version": 0, "led_count": 500, "fps": 60}'
+    >>> encode_header(led_count=500, fps=60, version=1)
+    '{"version": 1, "led_count": 500, "fps": 60}'
+    >>> encode_header(led_count=500, fps=60, version=1, encodings=["raw", "repeat"])
+    '{"version": 1, "led_count": 500, "fps": 60, "encodings": ["raw", "repeat"]}'
     """
 
     if not isinstance(led_count, int):
         raise TypeError(f"led_count must be int, found {type(led_count)}.")
     if not isinstance(fps, int):
         raise TypeError(f"fps must be int, found {type(fps)}.")
+    if version not in VERSIONS:
+        raise ValueError(f"Unsupported version: {version}.")
 
     # Change version if structure of data changes
-    version = 0  # 0 for testing  # TODO: increase this
-    return json.dumps(
-        {
-            "version": version,
-            "led_count": led_count,
-            "fps": fps,
-        },
-        indent=None,
-    )
+    header: dict = {
+        "version": version,
+        "led_count": led_count,
+        "fps": fps,
+    }
+
+    if encodings is not None:
+        if version == 0:
+            raise ValueError("Version 0 does not support frame encodings.")
+        check_encodings(encodings)
+        header["encodings"] = list(encodings)
+
+    return json.dumps(header, indent=None)
 
 
 def decode_header(header: str) -> dict:
@@ -43,22 +94,77 @@ def decode_header(header: str) -> dict:
     """
 
     json_header = json.loads(header)
+    if not isinstance(json_header, dict):
+        raise ValueError("Header must be a JSON object.")  # noqa: TRY004 - invalid data, readers skip ValueErrors
     if "version" not in json_header:
         raise ValueError("Header must contain a version.")
 
-    if json_header["version"] == 0:
+    if json_header["version"] in VERSIONS:
         if not all(key in json_header for key in ("led_count", "fps")):
-            raise ValueError("Header (version 0) must contain led_count and fps.")
+            raise ValueError(f"Header (version {json_header['version']}) must contain led_count and fps.")
     else:
         raise ValueError(f"Unsupported header version: {json_header['version']}.")
 
+    if "encodings" in json_header:
+        check_encodings(json_header["encodings"])
+
     return json_header
 
 
-def encode_frame(frame: list, led_count: int) -> str:
+def check_encodings(encodings: list):
+    """Raises a ValueError if encodings is not a list of known frame encodings."""
+
+    if not isinstance(encodings, list) or not all(encoding in ENCODINGS for encoding in encodings):
+        raise ValueError(f"encodings must be a list of {tuple(ENCODINGS)}, found {encodings}.")
+
+
+def frame_to_bytes(frame, led_count: int) -> bytes:
+    """Returns r, g, b values of the frame packed into bytes.
+    frame can be a Frame, a bytes-like object with 3 bytes per led, a NumPy array
+    with 3 integers per led (for example shape (led_count, 3)) or a list of rgb tuples.
+    Will raise a ValueError if the frame is not valid.
+
+    Examples:
+    >>> frame_to_bytes([(0, 1, 2), (3, 4, 5)], 2)
+    b'\\x00\\x01\\x02\\x03\\x04\\x05'
+    """
+
+    if isinstance(frame, Frame):
+        data = frame.data
+    elif isinstance(frame, (bytes, bytearray, memoryview)):
+        data = frame
+    elif numpy is not None and isinstance(frame, numpy.ndarray):
+        if frame.size != 3 * led_count:
+            raise ValueError(f"frame must have a value for every led, has {frame.size // 3}/{led_count}.")
+        if frame.dtype.kind not in "iu":
+            raise ValueError("frame must have an rbg tuple of ints for values.")
+        if frame.dtype.kind != "u" or frame.dtype.itemsize != 1:
+            if frame.size and (frame.min() < 0 or frame.max() > 255):
+                raise ValueError("frame values must be between 0 and 255.")
+            frame = frame.astype("uint8")
+        return frame.tobytes()
+    else:
+        if len(frame) != led_count:
+            raise ValueError(f"frame must have a value for every led, has {len(frame)}/{led_count}.")
+        if led_count and set(map(len, frame)) != {3}:
+            raise ValueError("frame must have an rbg tuple of ints for values.")
+        try:
+            return bytes(chain.from_iterable(frame))
+        except TypeError:
+            raise ValueError("frame must have an rbg tuple of ints for values.") from None
+        except ValueError:
+            raise ValueError("frame values must be between 0 and 255.") from None
+
+    if len(data) != 3 * led_count:
+        raise ValueError(f"frame must have a value for every led, has {len(data) // 3}/{led_count}.")
+    return bytes(data)
+
+
+def encode_frame(frame, led_count: int) -> str:
     """Encodes a frame into a string of hex values.
     Each led in the frame is represented by a tuple of 3 integers (r, g, b).
     There must be led_count number of tuples in the frame. Will raise a ValueError if the frame is not valid.
+    The frame can also be anything else frame_to_bytes accepts.
     The output string will have 6 characters per led, 2 for each rgb value.
 
     Examples:
@@ -66,35 +172,265 @@ def encode_frame(frame: list, led_count: int) -> str:
     '0001020304050096ff'
     """
 
-    if len(frame) != led_count:
-        raise ValueError(f"frame must have a value for every led, has {len(frame)}/{led_count}.")
-    if not all(len(rgb) == 3 and (isinstance(v, int) for v in rgb) for rgb in frame):
-        raise ValueError("frame must have an rbg tuple of ints for values.")
+    return frame_to_bytes(frame, led_count).hex()
+
+
+def encode_binary_frame(frame, led_count: int) -> bytes:
+    """Encodes a frame into a version 1 binary record, including the "#" prefix.
+    Accepts the same frames as frame_to_bytes.
+
+    Examples:
+    >>> encode_binary_frame([(0, 1, 2), (3, 4, 5)], 2)
+    b'#\\x01\\x00\\x00\\x00\\x06\\x00\\x01\\x02\\x03\\x04\\x05'
+    """
+
+    return encode_record(RECORD_RAW, frame_to_bytes(frame, led_count))
+
+
+def encode_compressed_frame(frame, led_count: int, previous: "None | bytes", encodings: list) -> bytes:
+    """Encodes a frame into the smallest version 1 record of the given encodings.
+    previous are the bytes of the previous frame (None for the first frame).
+    "raw" is always allowed, "repeat" and "delta" only if there is a previous frame.
+
+    Examples:
+    >>> red = bytes((255, 0, 0)) * 100
+    >>> len(encode_compressed_frame(red, 100, None, ["rle"]))
+    11
+    >>> encode_compressed_frame(red, 100, red, ["delta", "repeat"])
+    b'#\\x04\\x00\\x00\\x00\\x00'
+    """
+
+    data = frame_to_bytes(frame, led_count)
+    if previous is not None and "repeat" in encodings and data == previous:
+        return encode_record(RECORD_REPEAT, b"")
+
+    record_type = RECORD_RAW
+    payload = data
+    if previous is not None and "delta" in encodings:
+        delta = encode_delta(data, previous, limit=len(payload))
+        if delta is not None:
+            record_type, payload = RECORD_DELTA, delta
+    if "rle" in encodings:
+        rle = encode_rle(data, limit=len(payload))
+        if rle is not None:
+            record_type, payload = RECORD_RLE, rle
+
+    return encode_record(record_type, payload)
+
+
+def led_differences(a: "bytes | bytearray | memoryview", b: "bytes | bytearray | memoryview") -> bytes:
+    """Returns a byte for every led, 0 where the colors of a and b are the same, 1 where they differ.
+    The frames are compared with NumPy, or as big integers (xor) if it is not installed,
+    so there is no loop over leds in Python.
+
+    Examples:
+    >>> led_differences(bytes([1, 2, 3, 4, 5, 6]), bytes([1, 2, 3, 4, 0, 6]))
+    b'\\x00\\x01'
+    """
+
+    if len(a) != len(b):
+        raise ValueError("Frames must have the same size.")
+    size = len(a)
+    if numpy is not None:
+        diff = numpy.frombuffer(a, dtype=numpy.uint8) != numpy.frombuffer(b, dtype=numpy.uint8)
+        return (diff[0::3] | diff[1::3] | diff[2::3]).view(numpy.uint8).tobytes()
+    diff = (int.from_bytes(a, byteorder="big") ^ int.from_bytes(b, byteorder="big")).to_bytes(size, byteorder="big")
+    # a led differs if any of its 3 bytes differs
+    leds = (
+        int.from_bytes(diff[0::3], byteorder="big")
+        | int.from_bytes(diff[1::3], byteorder="big")
+        | int.from_bytes(diff[2::3], byteorder="big")
+    )
+    return leds.to_bytes(size // 3, byteorder="big").translate(NONZERO)
+
+
+def runs_of(mask: bytes, value: int):
+    """Yields (start, stop) of runs of value in mask, with bytes.find."""
 
-    return "".join(hex(v)[2:].zfill(2) for rgb in frame for v in rgb)
+    other = value ^ 1
+    start = mask.find(value)
+    while start != -1:
+        stop = mask.find(other, start)
+        if stop == -1:
+            stop = len(mask)
+        yield start, stop
+        start = mask.find(value, stop)
+
+
+def encode_delta(
+    data: "bytes | bytearray | memoryview", previous: "bytes | bytearray | memoryview", limit: "None | int" = None
+) -> "None | bytes":
+    """Returns the payload of a delta record that changes previous into data.
+    Returns None if the payload would not be shorter than limit.
+
+    Examples:
+    >>> encode_delta(bytes([1, 2, 3, 4, 5, 6]), bytes([1, 2, 3, 0, 0, 0]))
+    b'\\x00\\x00\\x00\\x01\\x00\\x01\\x04\\x05\\x06'
+    """
 
+    changed = led_differences(data, previous)
+    changed_count = len(changed) - changed.count(0)
+    if limit is not None and changed_count and DELTA_SPAN_HEADER_SIZE + 3 * changed_count >= limit:
+        # the payload can not be shorter than the changed colors
+        return None
+
+    # join runs of changed leds into spans, small gaps are cheaper to send than a new span
+    spans = []
+    size = 0
+    for start, stop in runs_of(changed, 1):
+        while start < stop:
+            if spans and start - spans[-1][1] <= DELTA_SPAN_HEADER_SIZE // 3 and start - spans[-1][0] < MAX_RUN:
+                span = spans[-1]
+                size += 3 * (min(stop, span[0] + MAX_RUN) - span[1])
+                span[1] = min(stop, span[0] + MAX_RUN)
+            else:
+                span = [start, min(stop, start + MAX_RUN)]
+                spans.append(span)
+                size += DELTA_SPAN_HEADER_SIZE + 3 * (span[1] - span[0])
+            start = span[1]
+        if limit is not None and size >= limit:
+            return None
+    if limit is not None and size >= limit:
+        return None
+
+    parts = []
+    for start, stop in spans:
+        parts.append(start.to_bytes(4, byteorder="big") + (stop - start).to_bytes(2, byteorder="big"))
+        parts.append(data[3 * start : 3 * stop])
+    return b"".join(parts)
+
+
+def apply_delta(buffer: bytearray, payload: "bytes | bytearray | memoryview"):
+    """Applies the payload of a delta record to buffer (the previous frame) in place.
+    Raises a ValueError if the payload is not valid."""
+
+    pos = 0
+    while pos < len(payload):
+        if len(payload) - pos < DELTA_SPAN_HEADER_SIZE:
+            raise ValueError("Delta span is cut off.")
+        start = 3 * int.from_bytes(payload[pos : pos + 4], byteorder="big")
+        stop = start + 3 * int.from_bytes(payload[pos + 4 : pos + DELTA_SPAN_HEADER_SIZE], byteorder="big")
+        pos += DELTA_SPAN_HEADER_SIZE
+        if stop > len(buffer) or pos + stop - start > len(payload):
+            raise ValueError("Delta span is out of range.")
+        buffer[start:stop] = payload[pos : pos + stop - start]
+        pos += stop - start
+
+
+def encode_rle(data: "bytes | bytearray | memoryview", limit: "None | int" = None) -> "None | bytes":
+    """Returns the payload of an rle record for data.
+    Returns None if the payload would not be shorter than limit.
+
+    Examples:
+    >>> encode_rle(bytes([1, 2, 3, 1, 2, 3, 0, 0, 0]))
+    b'\\x00\\x02\\x01\\x02\\x03\\x00\\x01\\x00\\x00\\x00'
+    """
 
-def decode_frame(frame: str, led_count: int, version: int) -> list:
-    """Decodes a frame string into a list of rgb tuples.
+    led_count = len(data) // 3
+    if not led_count:
+        return None if limit is not None and limit <= 0 else b""
+
+    # led i + 1 starts a new run where it differs from led i
+    starts = led_differences(data[3:], data[:-3])
+    run_count = 1 + len(starts) - starts.count(0)
+    if limit is not None and RLE_RUN_SIZE * run_count >= limit:
+        # long runs are split, so there are at least this many runs
+        return None
+
+    ends = []  # the last led of every run
+    for first, stop in runs_of(starts, 1):
+        ends.extend(range(first, stop))
+    ends.append(led_count - 1)
+
+    parts = []
+    size = 0
+    start = 0
+    for end in ends:
+        stop = end + 1
+        color = data[3 * start : 3 * start + 3]
+        while start < stop:
+            count = min(stop - start, MAX_RUN)
+            parts.append(count.to_bytes(2, byteorder="big") + color)
+            size += RLE_RUN_SIZE
+            start += count
+        if limit is not None and size >= limit:
+            return None
+    return b"".join(parts)
+
+
+def decode_rle(payload: "bytes | bytearray | memoryview", led_count: int) -> bytearray:
+    """Decodes the payload of an rle record. Raises a ValueError if it is not valid."""
+
+    if len(payload) % RLE_RUN_SIZE != 0:
+        raise ValueError("Rle run is cut off.")
+
+    # the size is checked before anything is expanded, a corrupt count can be up to MAX_RUN
+    counts = [int.from_bytes(payload[pos : pos + 2], byteorder="big") for pos in range(0, len(payload), RLE_RUN_SIZE)]
+    if sum(counts) != led_count:
+        raise ValueError(f"Frame has wrong size, expected exactly {3 * led_count} bytes, found {3 * sum(counts)}.")
+
+    data = bytearray()
+    for pos, count in zip(range(2, len(payload), RLE_RUN_SIZE), counts):
+        data += bytes(payload[pos : pos + 3]) * count
+    return data
+
+
+def encode_record(record_type: int, payload: bytes) -> bytes:
+    """Prefixes payload with a "#", the record type and the payload length."""
+    return b"#" + bytes((record_type,)) + len(payload).to_bytes(4, byteorder="big") + payload
+
+
+def record_length(buffer: "bytes | bytearray | memoryview", start: int) -> int:
+    """Returns the length of the binary record that starts at start (including the header)
+    or -1 if the whole record header is not in the buffer yet."""
+
+    if len(buffer) - start < RECORD_HEADER_SIZE:
+        return -1
+    return RECORD_HEADER_SIZE + int.from_bytes(buffer[start + 2 : start + RECORD_HEADER_SIZE], byteorder="big")
+
+
+def decode_frame(frame: "str | bytes | bytearray | memoryview", led_count: int, version: int) -> Frame:
+    """Decodes a frame string into a Frame, which behaves like a list of rgb tuples.
     The frame string must have 6 characters per led, 2 for each rgb value.
+    It can also be given as ASCII bytes, which saves decoding it to a str first.
+    For version 1 frame is the payload of a binary record: 3 bytes per led.
     Will raise a ValueError if the frame is not valid.
 
     If format ever changes so will the version number. This will allow for backwards compatibility.
 
     Examples:
     >>> decode_frame('0001020304050096ff', 3, version=0)
-    [(0, 1, 2), (3, 4, 5), (0, 150, 255)]
+    Frame([(0, 1, 2), (3, 4, 5), (0, 150, 255)])
+    >>> decode_frame(b'0001020304050096ff', 3, version=0) == [(0, 1, 2), (3, 4, 5), (0, 150, 255)]
+    True
+    >>> decode_frame(bytes([0, 1, 2, 3, 4, 5, 0, 150, 255]), 3, version=1)
+    Frame([(0, 1, 2), (3, 4, 5), (0, 150, 255)])
     """
 
-    assert version in (0,), f"Unsupported frame version: {version}."
-    if not isinstance(frame, str):
-        raise TypeError(f"Expected type 'str', found type {type(frame)}.")
+    if version not in VERSIONS:
+        raise ValueError(f"Unsupported frame version: {version}.")
+    if version == 1:
+        if not isinstance(frame, (bytes, bytearray, memoryview)):
+            raise TypeError(f"Expected type 'bytes', found type {type(frame)}.")
+        if len(frame) != 3 * led_count:
+            raise ValueError(f"Frame has wrong size, expected exactly {3 * led_count} bytes, found {len(frame)}.")
+        return Frame(frame if isinstance(frame, bytearray) else bytearray(frame))
+
+    if not isinstance(frame, (str, bytes, bytearray, memoryview)):
+        raise TypeError(f"Expected type 'str' or 'bytes', found type {type(frame)}.")
 
     expected_length = 3 * led_count * 2  # 3 * 2 characters per led
     if len(frame) != expected_length:
         raise ValueError(f"Frame has wrong size, expected exactly {expected_length} bytes, found {len(frame)}.")
 
-    return [
-        (int(frame[i : i + 2], 16), int(frame[i + 2 : i + 4], 16), int(frame[i + 4 : i + 6], 16))
-        for i in range(0, len(frame), 6)
-    ]
+    if isinstance(frame, str):
+        data = bytearray.fromhex(frame)
+    else:
+        # bytes.fromhex only takes str, binascii works on bytes directly
+        data = bytearray(binascii.a2b_hex(frame))
+
+    # fromhex skips whitespace, so the length has to be checked again
+    if len(data) != 3 * led_count:
+        raise ValueError(f"Frame is not valid hex, expected {expected_length} hex digits.")
+
+    return Frame(data)
@@ -0,0 +1,263 @@
+"""Validation of jelka data streams and the jelka-validate command.
+
+Unlike DataReader, which raises an error at the first invalid frame, the
+Validator reports every problem in a stream with the offset (in bytes from
+the start of the stream) where the invalid header, line or record starts,
+and goes on with the next one.
+
+Usage:
+    jelka-validate pattern1.txt pattern2.txt ...      # recorded streams
+    jelka-validate --run "python3 pattern.py" --timeout 10
+
+Many files are validated in parallel, in a pool of processes (see --jobs).
+The exit code is 1 if any stream has a problem."""
+
+import argparse
+import os
+import shlex
+import subprocess
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from .datareader import BytesReader
+from .utils import RECORD_HEADER_SIZE, RECORD_TYPES, decode_frame, decode_header, record_length
+
+linesepb = os.linesep.encode(encoding="utf-8")
+
+
+class Report:
+    """Result of validating a stream. problems is a list of (offset, message) tuples,
+    at most max_problems of them are kept, problem_count counts all of them."""
+
+    def __init__(self, name: str = "", max_problems: int = 100) -> None:
+        self.name = name
+        self.header: "None | dict" = None
+        self.frame_count = 0
+        self.size = 0  # bytes in the stream
+        self.problems = []
+        self.problem_count = 0
+        self.max_problems = max_problems
+
+    @property
+    def ok(self) -> bool:
+        return self.header is not None and self.problem_count == 0
+
+    def add_problem(self, offset: int, message: str):
+        self.problem_count += 1
+        if len(self.problems) < self.max_problems:
+            self.problems.append((offset, message))
+
+    def __repr__(self) -> str:
+        return f"Report({self.name!r}, frames={self.frame_count}, problems={self.problem_count})"
+
+
+class Validator:
+    """Checks a stream given in chunks (see feed). Call finish after the last chunk.
+
+    Examples:
+    >>> validator = Validator()
+    >>> validator.feed(b'#{"version": 0, "led_count": 1, "fps": 60}\\n#000000\\n#00\\nuser text\\n#ffffff\\n')
+    >>> report = validator.finish()
+    >>> report.frame_count, report.problems
+    (2, [(51, 'Frame has wrong size, expected exactly 6 bytes, found 2.')])
+    """
+
+    def __init__(self, name: str = "", max_problems: int = 100) -> None:
+        self.report = Report(name, max_problems)
+        self.buffer = bytearray()
+        self.offset = 0  # offset of the start of the buffer in the stream
+        # keeps the state needed for records (allowed types and the previous frame)
+        self.bytes_reader = BytesReader()
+
+    def feed(self, data: bytes):
+        self.report.size += len(data)
+        self.buffer += data
+        self.check(final=False)
+
+    def finish(self) -> Report:
+        self.check(final=True)
+        if self.report.header is None and not self.report.problem_count:
+            self.report.add_problem(self.report.size, "Stream has no header.")
+        return self.report
+
+    def check(self, final: bool):
+        """Checks everything that is complete in the buffer. If final is True,
+        there is no more data, so everything left is reported as incomplete."""
+
+        buffer = self.buffer
+        pos = 0
+        while True:
+            start = buffer.find(b"#", pos)
+            if start == -1:
+                pos = len(buffer)
+                break
+            if start + 1 >= len(buffer):
+                pos = start
+                break
+
+            if buffer[start + 1] in RECORD_TYPES:
+                end = self.check_record(start)
+            else:
+                end = self.check_line(start)
+            if end == -1:
+                pos = start
+                break
+            pos = end
+
+        if final and pos < len(buffer):
+            self.report.add_problem(self.offset + pos, "Stream ends in the middle of jelka data.")
+            pos = len(buffer)
+
+        del buffer[:pos]
+        self.offset += pos
+
+    def check_line(self, start: int) -> int:
+        """Checks the header or a frame line. Returns where the next data starts
+        or -1 if the line is not complete."""
+
+        end = self.buffer.find(linesepb, start)
+        if end == -1:
+            return -1
+        text = bytes(self.buffer[start + 1 : end])
+        report = self.report
+
+        try:
+            if report.header is None:
+                self.check_header(text)
+            elif report.header["version"] != 0:
+                raise ValueError(f"Frames must be binary records in version {report.header['version']}.")
+            else:
+                decode_frame(text, report.header["led_count"], version=0)
+                report.frame_count += 1
+        except (ValueError, UnicodeDecodeError) as error:
+            report.add_problem(self.offset + start, str(error))
+        return end + len(linesepb)
+
+    def check_header(self, text: bytes):
+        header = decode_header(text.decode(encoding="utf-8").strip())
+        led_count, fps = header["led_count"], header["fps"]
+        if not isinstance(led_count, int) or isinstance(led_count, bool) or led_count < 0:
+            raise ValueError(f"led_count must be a non-negative int, found {led_count!r}.")
+        if not isinstance(fps, (int, float)) or isinstance(fps, bool) or fps <= 0:
+            raise ValueError(f"fps must be a positive number, found {fps!r}.")
+
+        self.report.header = header
+        self.bytes_reader.set_header(header)
+
+    def check_record(self, start: int) -> int:
+        """Checks a binary record. Returns where the next data starts
+        or -1 if the record is not complete."""
+
+        buffer = self.buffer
+        length = record_length(buffer, start)
+        if length == -1:
+            return -1
+
+        report = self.report
+        reader = self.bytes_reader
+        try:
+            if report.header is None:
+                raise ValueError("Frame before the header.")
+            reader.check_record_length(length)
+        except ValueError as error:
+            # the length can not be trusted, only the record header is skipped (like BytesReader does)
+            report.add_problem(self.offset + start, str(error))
+            return start + RECORD_HEADER_SIZE
+
+        end = start + length
+        if end > len(buffer):
+            return -1
+        try:
+            if report.header["version"] == 0:
+                raise ValueError("Binary frames are not supported in version 0.")
+            reader.decode_record(buffer[start + 1], bytes(buffer[start + RECORD_HEADER_SIZE : end]))
+            report.frame_count += 1
+        except ValueError as error:
+            report.add_problem(self.offset + start, str(error))
+        return end
+
+
+def validate_file(path: str, chunk_size: int = 1 << 20, max_problems: int = 100) -> Report:
+    validator = Validator(path, max_problems)
+    try:
+        with open(path, "rb") as file:
+            for chunk in iter(lambda: file.read(chunk_size), b""):
+                validator.feed(chunk)
+    except OSError as error:
+        validator.report.add_problem(0, str(error))
+        return validator.report
+    return validator.finish()
+
+
+def validate_files(paths: list, jobs: "None | int" = None, max_problems: int = 100) -> list:
+    """Validates files in a pool of jobs processes (the number of CPUs by default).
+    Returns reports in the same order as paths."""
+
+    if jobs == 1 or len(paths) <= 1:
+        return [validate_file(path, max_problems=max_problems) for path in paths]
+
+    with ProcessPoolExecutor(jobs) as executor:
+        futures = [executor.submit(validate_file, path, max_problems=max_problems) for path in paths]
+        return [future.result() for future in futures]
+
+
+def validate_process(args: list, timeout: "None | float" = None, max_problems: int = 100) -> Report:
+    """Runs a pattern and validates its output. If timeout (seconds) is given,
+    the process is killed after it and the stream is checked up to that point."""
+
+    validator = Validator(shlex.join(args), max_problems)
+    process = subprocess.Popen(args, stdout=subprocess.PIPE)
+    timer = None
+    if timeout is not None:
+        timer = threading.Timer(timeout, process.kill)
+        timer.start()
+
+    try:
+        for chunk in iter(lambda: process.stdout.read1(1 << 16), b""):  # type: ignore
+            validator.feed(chunk)
+    finally:
+        if timer is not None:
+            timer.cancel()
+        process.kill()
+        process.wait()
+    return validator.finish()
+
+
+def print_report(report: Report, verbose: bool = True):
+    if report.ok:
+        if verbose:
+            print(f"{report.name}: OK ({report.frame_count} frames)")
+        return
+
+    for offset, message in report.problems:
+        print(f"{report.name}:{offset}: {message}")
+    hidden = report.problem_count - len(report.problems)
+    if hidden:
+        print(f"{report.name}: {hidden} more problems")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="jelka-validate", description="Validates jelka data streams.")
+    parser.add_argument("paths", nargs="*", help="recorded streams")
+    parser.add_argument("--run", metavar="COMMAND", help="validate the output of a pattern")
+    parser.add_argument("--timeout", type=float, help="stop the pattern after this many seconds")
+    parser.add_argument("--jobs", "-j", type=int, help="number of processes (number of CPUs by default)")
+    parser.add_argument("--max-problems", type=int, default=100, help="problems listed per stream (default 100)")
+    parser.add_argument("--quiet", "-q", action="store_true", help="only print problems")
+    args = parser.parse_args(argv)
+
+    if not args.paths and not args.run:
+        parser.error("give at least one path or --run")
+
+    reports = validate_files(args.paths, args.jobs, args.max_problems)
+    if args.run:
+        reports.append(validate_process(shlex.split(args.run), args.timeout, args.max_problems))
+
+    for report in reports:
+        print_report(report, verbose=not args.quiet)
+    return 0 if all(report.ok for report in reports) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
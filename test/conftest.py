@@ -0,0 +1,11 @@
+import pytest
+
+
+@pytest.fixture(params=["numpy", "python"])
+def backend(request, monkeypatch):
+    """Runs a test with NumPy and with the plain Python code of the module in NUMPY_MODULE
+    of the test module (its optional numpy import is set to None)."""
+
+    if request.param == "python":
+        monkeypatch.setattr(request.module.NUMPY_MODULE, "numpy", None)
+    return request.param
@@ -0,0 +1,141 @@
+"""Headless renderer of LED frames into NumPy images (no display or pygame needed).
+
+The camera and projection are the same as in the simulator. Everything that does not
+depend on colors (projection, culling, which pixels belong to which LED and which LED
+is in front) is computed once, so rendering a frame is a single indexed copy and
+a batch of frames is rendered at once:
+
+    renderer = Renderer(positions, width=320, height=240)
+    images = renderer.render_batch(frames)  # (len(frames), 240, 320, 3) uint8
+    write_raw_video("preview.rgb", images)  # ffmpeg -f rawvideo -pix_fmt rgb24 -s 320x240 -i preview.rgb
+"""
+
+import os
+
+from numpy import arange, asarray, frombuffer, lexsort, ogrid, ones, round, uint8, unique, zeros
+
+from jelka_validator.utils import frame_to_bytes
+
+try:
+    from .simulator import project, rotation
+except ImportError:  # run as a script from the test directory, like test_pysim.py
+    from simulator import project, rotation
+
+
+class Renderer:
+    """Renders frames for LEDs at positions (a dict {id: (x, y, z)} or an (N, 3) array, where
+    row i is the LED with id i). Color i of a frame is used for the LED with id i.
+    Every LED is a disk with the given radius in pixels, nearer LEDs cover farther ones."""
+
+    def __init__(
+        self, positions, width=320, height=240, phi: float = 0, tau: float = 0, camera=(0, -500, 100), scale=1, radius=2
+    ):
+        if isinstance(positions, dict):
+            ids = sorted(positions)
+            positions = [positions[i] for i in ids]
+        else:
+            ids = range(len(positions))
+        self.ids = asarray(ids, dtype=int)
+        self.positions = asarray(positions, dtype=float).reshape(-1, 3)
+        self.led_count = int(self.ids.max(initial=-1)) + 1  # colors a frame must have
+
+        self.width = width
+        self.height = height
+        self.camera = camera
+        self.scale = scale
+        self.radius = radius
+        self.set_view(phi, tau)
+
+    def set_view(self, phi: float, tau: float):
+        """Rotates the tree and computes which LED is shown on which pixel."""
+
+        self.phi, self.tau = phi, tau
+        w, h = self.width, self.height
+        x, z, depth = project(self.positions @ rotation(phi, tau).T, self.camera)
+        cx = round(w * x * self.scale + w // 2).astype(int)
+        cy = round(-w * z * self.scale + h // 2).astype(int)
+
+        # pixels of a disk around (0, 0)
+        dy, dx = ogrid[-self.radius : self.radius + 1, -self.radius : self.radius + 1]
+        inside = dx**2 + dy**2 <= self.radius**2
+        disk_x = (dx * ones(inside.shape, dtype=int))[inside]
+        disk_y = (dy * ones(inside.shape, dtype=int))[inside]
+
+        # every pixel of every visible led, leds behind the camera are culled
+        leds = arange(len(depth))[depth > 0]
+        px = (cx[leds, None] + disk_x).ravel()
+        py = (cy[leds, None] + disk_y).ravel()
+        owner = leds.repeat(len(disk_x))
+        on_screen = (0 <= px) & (px < w) & (0 <= py) & (py < h)
+        pixels = (py * w + px)[on_screen]
+        owner = owner[on_screen]
+
+        # where disks overlap, the nearest led is shown
+        order = lexsort((depth[owner], pixels))
+        pixels, owner = pixels[order], owner[order]
+        pixels, first = unique(pixels, return_index=True)
+        self.pixels = pixels
+        self.owner = owner[first]
+        self.owner_ids = self.ids[self.owner]  # color index in a frame
+
+    def colors(self, frame):
+        """Returns colors of a frame as an (led_count, 3) uint8 array."""
+
+        if hasattr(frame, "__array_interface__"):
+            frame = asarray(frame, dtype=uint8).reshape(-1, 3)
+            if len(frame) != self.led_count:
+                raise ValueError(f"frame must have a value for every led, has {len(frame)}/{self.led_count}.")
+            return frame
+        return frombuffer(frame_to_bytes(frame, self.led_count), dtype=uint8).reshape(-1, 3)
+
+    def render(self, frame):
+        """Returns a (height, width, 3) uint8 image of the frame."""
+        return self.render_batch([frame])[0]
+
+    def render_batch(self, frames):
+        """Returns a (len(frames), height, width, 3) uint8 array of images."""
+
+        colors = asarray([self.colors(frame) for frame in frames], dtype=uint8).reshape(-1, self.led_count, 3)
+        images = zeros((len(colors), self.height * self.width, 3), dtype=uint8)
+        images[:, self.pixels] = colors[:, self.owner_ids]
+        return images.reshape(len(colors), self.height, self.width, 3)
+
+    def render_reader(self, reader, count, batch_size=256):
+        """Yields batches of images of the next count frames from a DataReader (or any iterator of frames)."""
+
+        while count > 0:
+            size = min(batch_size, count)
+            yield self.render_batch([next(reader) for _ in range(size)])
+            count -= size
+
+
+def write_ppm(path, image):
+    """Writes an (height, width, 3) uint8 image as a binary PPM file."""
+
+    height, width, _ = image.shape
+    with open(path, "wb") as file:
+        file.write(f"P6\n{width} {height}\n255\n".encode())
+        file.write(asarray(image, dtype=uint8).tobytes())
+
+
+def write_ppm_sequence(directory, images, start=0):
+    """Writes images as frame_00000.ppm, frame_00001.ppm, ... to directory. Returns the paths."""
+
+    paths = []
+    for i, image in enumerate(images, start):
+        path = os.path.join(directory, f"frame_{i:05d}.ppm")
+        write_ppm(path, image)
+        paths.append(path)
+    return paths
+
+
+def write_raw_video(file, images):
+    """Appends images (or batches of images) to a raw rgb24 video. file is a path or a binary file.
+    It can be converted with: ffmpeg -f rawvideo -pix_fmt rgb24 -s WIDTHxHEIGHT -r FPS -i FILE out.mp4"""
+
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, "ab") as f:
+            write_raw_video(f, images)
+        return
+    for image in images:
+        file.write(asarray(image, dtype=uint8).tobytes())
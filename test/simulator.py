@@ -1,12 +1,20 @@
-from numpy import array, cos, sin, random
+from numpy import arange, array, cos, flatnonzero, frombuffer, full, maximum, ndarray, random, sin, uint8, zeros
 
+from jelka_validator.utils import frame_to_bytes
 
-def proj(point, cam):
-    dy = point[1][0] - cam[1]
-    if dy != 0:
-        return ((point[0][0] - cam[0]) / dy, (point[2][0] - cam[2]) / dy, dy)
-    else:
-        return (0, 0, 1)
+
+def project(points, cam):
+    """Projects rotated points (an (N, 3) array) onto the screen of a camera looking along y.
+    Returns arrays x, z and depth. Points with depth 0 are projected to the center."""
+
+    depth = points[:, 1] - cam[1]
+    safe = depth.copy()
+    safe[safe == 0] = 1
+    x = (points[:, 0] - cam[0]) / safe
+    z = (points[:, 2] - cam[2]) / safe
+    x[depth == 0] = 0
+    z[depth == 0] = 0
+    return x, z, depth
 
 
 def rotation(phi, tau):
@@ -28,21 +36,6 @@ def random_tree(n=300, origin=(0, 0, 0), height=200, max_width=120, min_width=60
             yield (x + origin[0], y + origin[1], origin[2] + h)
 
 
-def draw_lucka(pygame, lucka, screen, size, color, scale):
-    w, h = pygame.display.get_surface().get_size()
-    pygame.draw.circle(screen, color, (w * lucka[0] * scale + w // 2, (-w * lucka[1] * scale + h // 2)), size + 3)
-
-
-def draw_line(pygame, p1, p2, screen, color, scale):
-    w, h = pygame.display.get_surface().get_size()
-    pygame.draw.line(
-        screen,
-        color,
-        (w * p1[0] * scale + w // 2, (-w * p1[1] * scale + h // 2)),
-        (w * p2[0] * scale + w // 2, (-w * p2[1] * scale + h // 2)),
-    )
-
-
 class Simulation:
     def __init__(self, smreka=None) -> None:
         self.running = True
@@ -52,23 +45,51 @@ class Simulation:
             self.smreka = {i: pos for i, pos in enumerate(random_tree())}
         else:
             self.smreka = smreka.copy()
-        self.points = {i: array([[p[0]], [p[1]], [p[2]]]) for i, p in self.smreka.items()}
-        self.colors = {i: (random.randint(0, 255), random.randint(0, 255), random.randint(0, 255)) for i in self.smreka}
+
+        # leds are stored in the order of their ids, which is also the order of the wire
+        self.ids = array(sorted(self.smreka), dtype=int)
+        self.positions = array([self.smreka[i] for i in self.ids], dtype=float).reshape(-1, 3)
+        self.colors = random.randint(0, 256, size=(len(self.ids), 3)).astype(uint8)
 
         self.scale = 1
         self.camera = (0, -500, 100)
 
     def set_colors(self, colors):
+        """Sets colors from a frame: a Frame, bytes with 3 bytes per led, a NumPy array or a list
+        of rgb tuples (anything frame_to_bytes accepts). Color i is used for the led with id i.
+        A dict {id: color} is accepted as well."""
+
         if not self.running:
             raise InterruptedError("Simulation stopped.")
+        if isinstance(colors, dict):
+            ids = list(colors)
+            colors = [colors[i] for i in ids]
+        else:
+            ids = None
+
+        if isinstance(colors, (bytes, bytearray, memoryview)):
+            led_count = len(colors) // 3
+        elif isinstance(colors, ndarray):
+            led_count = colors.size // 3
+        else:
+            led_count = len(colors)
+
         try:
-            for i, c in colors.items():
-                assert all(isinstance(c[i], int) for i in range(3))
-                assert all(0 <= c[i] <= 255 for i in range(3))
-        except AssertionError:
+            data = frame_to_bytes(colors, led_count)
+        except ValueError as error:
             self.running = False
-            raise ValueError(f"Wrong shape for color: ({i}: {c})") from None  # type: ignore
-        self.colors = {pk: tuple(color) for pk, color in colors.items()}
+            raise ValueError(f"Wrong shape for colors: {error}") from None
+        values = frombuffer(data, dtype=uint8).reshape(-1, 3)
+
+        if ids is not None:
+            # scatter the dict into a frame indexed by led id
+            frame = zeros((max(max(ids, default=0), self.ids.max(initial=0)) + 1, 3), dtype=uint8)
+            frame[ids] = values
+            values = frame
+
+        self.colors = zeros((len(self.ids), 3), dtype=uint8)
+        known = self.ids < len(values)
+        self.colors[known] = values[self.ids[known]]
 
     def init(self):
         import pygame
@@ -79,6 +100,30 @@ class Simulation:
         self.clock = pygame.time.Clock()
         pygame.mouse.get_rel()
 
+    def project(self, w, h):
+        """Returns screen coordinates (an (N, 2) array), radii and a mask of visible leds."""
+
+        r = rotation(self.phi, self.tau)
+        x, z, depth = project(self.positions @ r.T, self.camera)
+        screen = zeros((len(x), 2))
+        screen[:, 0] = w * x * self.scale + w // 2
+        screen[:, 1] = -w * z * self.scale + h // 2
+        visible = depth > 0
+        radii = full(len(x), 1.0)
+        radii[visible] = maximum(20 / depth[visible], 1)
+        return screen, radii + 3, visible
+
+    def wire(self, visible):
+        """Splits indices of visible leds into runs of consecutive leds (parts of the wire)."""
+
+        indices = arange(len(visible))[visible]
+        if not len(indices):
+            return []
+        breaks = flatnonzero(indices[1:] - indices[:-1] != 1) + 1
+        starts = [0, *breaks.tolist()]
+        stops = [*breaks.tolist(), len(indices)]
+        return [indices[start:stop] for start, stop in zip(starts, stops) if stop - start > 1]
+
     def frame(self):
         pygame = self.pygame
         self.w, self.h = pygame.display.get_surface().get_size()
@@ -107,21 +152,20 @@ class Simulation:
 
         self.screen.fill("black")
 
-        r = rotation(self.phi, self.tau)
-        prev = None
-        projected = {i: proj(r @ p, self.camera) for i, p in self.points.items()}
+        screen, radii, visible = self.project(self.w, self.h)
+        for run in self.wire(visible):
+            pygame.draw.lines(self.screen, (10, 10, 10), False, screen[run].tolist())
 
-        for _, p in sorted(projected.items()):
-            if p[2] > 0 and prev and prev[2] > 0:
-                draw_line(pygame, p, prev, self.screen, (10, 10, 10), self.scale)
-            prev = p
+        # leds behind the camera are culled
+        circle = pygame.draw.circle
+        for color, center, radius in zip(self.colors[visible].tolist(), screen[visible].tolist(), radii[visible].tolist()):
+            circle(self.screen, color, center, radius)
 
-        for i, p in projected.items():
-            c = self.colors.get(i, (0, 0, 0))
-            draw_lucka(pygame, (p[0], p[1]), self.screen, max(20 / p[2], 1), c, self.scale)
-
-        p = proj(r @ array([[0], [0], [0]]), self.camera)
-        draw_lucka(pygame, (p[0], p[1]), self.screen, max(20 / p[2], 1), (0, 255, 0), self.scale)
+        # the origin
+        r = rotation(self.phi, self.tau)
+        x, z, depth = project(array([[0.0, 0.0, 0.0]]) @ r.T, self.camera)
+        center = (self.w * x[0] * self.scale + self.w // 2, -self.w * z[0] * self.scale + self.h // 2)
+        circle(self.screen, (0, 255, 0), center, max(20 / depth[0], 1) + 3)
         pygame.display.flip()
         self.clock.tick(60)  # limits FPS to 60
 
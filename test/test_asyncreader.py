@@ -0,0 +1,64 @@
+import asyncio
+import sys
+from os import linesep
+
+import pytest
+
+from src.jelka_validator import AsyncDataReader
+from src.jelka_validator.utils import encode_frame, encode_header
+
+
+def stream_of(*chunks):
+    stream = asyncio.StreamReader()
+    for chunk in chunks:
+        stream.feed_data(chunk)
+    stream.feed_eof()
+    return stream
+
+
+async def read_all(reader):
+    return [frame async for frame in reader]
+
+
+class TestAsyncDataReader:
+    def test_frames(self):
+        frames = [[(i, i, i)] * 2 for i in range(5)]
+        data = ("#" + encode_header(2, 60) + linesep + "log" + linesep).encode()
+        data += "".join("#" + encode_frame(frame, 2) + linesep for frame in frames).encode()
+
+        async def main():
+            reader = AsyncDataReader(stream_of(data[:10], data[10:]), chunk_size=7)
+            header = await reader.read_header()
+            return header, await read_all(reader), reader
+
+        header, result, reader = asyncio.run(main())
+        assert header == {"version": 0, "led_count": 2, "fps": 60}
+        assert result == frames
+        assert reader.frame_count == 5
+        assert reader.bytes_reader.user_buffer == ("log" + linesep).encode()
+
+    def test_no_header(self):
+        async def main():
+            reader = AsyncDataReader(stream_of(b"only user output"))
+            await reader.read_header()
+
+        with pytest.raises(EOFError):
+            asyncio.run(main())
+
+    def test_subprocess(self):
+        code = (
+            "import sys\n"
+            "sys.stdout.write('#' + sys.argv[1] + '\\n')\n"
+            "for i in range(3):\n"
+            "    sys.stdout.write('#' + bytes([i, i, i]).hex() + '\\n')\n"
+        )
+
+        async def main():
+            reader = await AsyncDataReader.from_subprocess(sys.executable, "-c", code, encode_header(1, 30))
+            frames = await read_all(reader)
+            await reader.close()
+            return reader.header, frames
+
+        header, frames = asyncio.run(main())
+        assert header == {"version": 0, "led_count": 1, "fps": 30}
+        assert frames == [[(i, i, i)] for i in range(3)]
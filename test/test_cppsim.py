@@ -19,6 +19,6 @@ if __name__ == "__main__":
         while sim.running:
             c = next(dr)
             dr.user_print()
-            sim.set_colors(dict(zip(range(len(c)), c)))
+            sim.set_colors(c)
             sim.frame()
         sim.quit()
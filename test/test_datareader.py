@@ -2,12 +2,29 @@
 
 import pytest
 
-from src.jelka_validator import DataReader
-from src.jelka_validator.utils import encode_header, encode_frame
+from src.jelka_validator import DataReader, Frame
+from src.jelka_validator import datareader
+from src.jelka_validator.datareader import BytesReader, readinto_function
+from src.jelka_validator.transform import OutputTransform
+from src.jelka_validator.utils import (
+    RECORD_DELTA,
+    RECORD_RAW,
+    RECORD_REPEAT,
+    encode_binary_frame,
+    encode_delta,
+    encode_frame,
+    encode_header,
+    encode_record,
+)
 
 from random import Random
 from os import linesep
+import io
 import json
+import os
+import queue
+import socket
+import time
 
 
 def random_frame(led_count, seed):
@@ -22,6 +39,28 @@ def header(led_count, fps):
     return BytesMaker(led_count, [hd], user=[], jelka=[])
 
 
+def wait_until(condition, timeout=5):
+    end = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < end, "Timed out."
+        time.sleep(0.001)
+
+
+class FakeClock:
+    """Clock for testing timing. Longer sleeps wake up a bit early, like the real ones can."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = 0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps += 1
+        self.now += seconds - 0.01 if seconds > 0.02 else seconds
+
+
 class BytesMaker:
     """Helper class for creating bytes from strings and frames - bad design, don't reuse this code"""
 
@@ -180,7 +219,9 @@ class TestDataReader:
             # missing frames should be the last avaiable frame
             assert frame == data.jelka[min(i, len(data.jelka) - 1)]
 
-        assert len(dr.frames) == 2
+        # frame 0 was consumed and removed, the last frame is kept
+        assert dr.frames == [data.jelka[1]]
+        assert dr.frames.end == 2
 
     def test_no_frames(self):
         data = header(led_count=5, fps=60)
@@ -279,3 +320,583 @@ class TestDataReader:
                 break
 
             assert frame == data.jelka[framei]
+
+    def test_capacity_drop_oldest(self):
+        data = header(led_count=2, fps=60) + 0 + 1 + 2 + 3 + 4
+
+        dr = DataReader(data.read, capacity=2)
+
+        assert next(dr) == data.jelka[3]
+        assert next(dr) == data.jelka[4]
+        assert next(dr) == data.jelka[4]
+        assert len(dr.frames) == 1
+        assert dr.frames.dropped == 3
+
+    def test_consumed_frames_released(self):
+        data = header(led_count=1, fps=60)
+        for i in range(500):
+            data + i
+
+        dr = DataReader(data.read)
+        for i in range(500):
+            assert next(dr) == data.jelka[i]
+            assert len(dr.frames) == 500 - i
+
+    def test_block_stops_reading(self):
+        data = header(led_count=2, fps=60)
+        start = data.read()
+        for i in range(100):
+            data + i
+        chunk = data.read()
+        calls = []
+
+        def read():
+            # the pattern always has more frames
+            calls.append(1)
+            return chunk if len(calls) > 1 else start + chunk
+
+        dr = DataReader(read, capacity=2, policy="block")
+        for i in range(200):
+            assert next(dr) == data.jelka[i % 100]
+        # new input is read only when the frames in the buffer are used up (about every 100 frames),
+        # not on every call
+        assert len(calls) == 3
+        assert len(dr.bytes_reader.jelka_buffer) < len(chunk)
+
+    def test_capacity_latest(self):
+        data = header(led_count=2, fps=60) + 0 + 1 + 2
+
+        dr = DataReader(data.read, policy="latest")
+
+        assert next(dr) == data.jelka[2]
+        data + 3 + 4
+        assert next(dr) == data.jelka[4]
+        assert dr.frames == [data.jelka[4]]
+        assert dr.frames.dropped == 3
+
+    def test_capacity_block(self):
+        data = header(led_count=2, fps=60) + 0 + 1 + 2 + 3 + 4
+
+        dr = DataReader(data.read, capacity=2, policy="block")
+
+        for i in range(5):
+            assert next(dr) == data.jelka[i]
+            assert len(dr.frames) <= 2
+
+        assert next(dr) == data.jelka[4]
+        assert dr.frames.dropped == 0
+
+    @pytest.mark.parametrize("threaded", [False, True])
+    def test_capacity_one_block(self, threaded):
+        data = header(led_count=2, fps=60) + 0 + 1 + 2
+        chunks = queue.Queue()
+        chunks.put(data.as_bytes())
+        # the thread can wait for input, a reader without one must not
+        read = chunks.get if threaded else data.read
+
+        with DataReader(read, capacity=1, policy="block", threaded=threaded) as dr:
+            frames = []
+            for _ in range(3):
+                if threaded:
+                    wait_until(lambda: dr.frames.end > len(frames))
+                frames.append(next(dr))
+            assert frames == data.jelka
+            assert next(dr) == data.jelka[2]
+            assert dr.frames.dropped == 0
+            chunks.put(b"")
+
+    def test_lazy_decoding(self):
+        data = header(led_count=3, fps=60)
+        for i in range(20):
+            data + i
+
+        dr = DataReader(data.read, policy="latest")
+        frame = next(dr)
+
+        assert frame == data.jelka[19]
+        assert frame.decoded
+
+        data + 20 + 21
+        dr.update()
+        assert [f.decoded for f in dr.frames] == [False]
+        assert dr.frames.dropped == 20
+
+    def test_lazy_invalid_frame(self):
+        data = header(led_count=1, fps=60)
+        data.entries.append("#abcdeg" + linesep)
+
+        dr = DataReader(data.read)
+        dr.update()
+
+        with pytest.raises(ValueError):
+            next(dr)
+
+    def test_realtime(self):
+        data = header(led_count=2, fps=10) + 0 + 1 + 2
+        clock = FakeClock()
+
+        dr = DataReader(data.read, realtime=True, clock=clock, sleep=clock.sleep)
+
+        assert next(dr) == data.jelka[0]
+        assert next(dr) == data.jelka[0]
+        assert dr.lag == 2
+
+        clock.now += 0.25
+        assert next(dr) == data.jelka[2]
+        assert dr.lag == 0
+
+        clock.now += 0.2
+        assert next(dr) == data.jelka[2]
+        assert dr.lag == -2
+
+    def test_wait_for_next_frame(self):
+        data = header(led_count=2, fps=10) + 0 + 1
+        clock = FakeClock()
+
+        dr = DataReader(data.read, clock=clock, sleep=clock.sleep)
+        dr.wait_for_next_frame()
+        assert clock.now == 0
+
+        next(dr)
+        clock.now += 0.03
+        dr.wait_for_next_frame()
+        assert clock.now == pytest.approx(0.1)
+        assert clock.sleeps == 2
+
+        next(dr)
+        clock.now += 0.5
+        dr.wait_for_next_frame()
+        assert clock.now == pytest.approx(0.6)
+        assert clock.sleeps == 2
+
+    def test_binary(self):
+        frames = [random_frame(4, i) for i in range(3)]
+        hd = "#" + encode_header(4, 60, version=1) + linesep
+        records = [encode_binary_frame(frame, 4) for frame in frames]
+        # newlines and "#" in the payload must not confuse the reader
+        frames.append([(10, 35, 13), (35, 10, 35)] * 2)
+        records.append(encode_binary_frame(frames[-1], 4))
+        bs = hd.encode() + b"text" + records[0] + b"more text" + linesep.encode() + b"".join(records[1:])
+
+        for size in (1, 5, len(bs)):
+            chunks = [bs[i : i + size] for i in range(0, len(bs), size)]
+            dr = DataReader(lambda chunks=chunks: chunks.pop(0) if chunks else b"")
+            while chunks:
+                dr.update()
+
+            assert dr.header == {"led_count": 4, "fps": 60, "version": 1}
+            assert dr.frames == frames
+            assert dr.bytes_reader.user_buffer == b"textmore text" + linesep.encode()
+
+    def test_binary_wrong_version(self):
+        data = header(led_count=1, fps=60)
+        data.entries.append(encode_binary_frame([(1, 2, 3)], 1).decode())
+
+        dr = DataReader(data.read)
+        with pytest.raises(ValueError):
+            dr.update()
+
+        hd = "#" + encode_header(1, 60, version=1) + linesep
+        data = BytesMaker(1, [hd]) + 0
+
+        dr = DataReader(data.read)
+        with pytest.raises(ValueError):
+            dr.update()
+
+    def test_encoding_not_announced(self):
+        hd = "#" + encode_header(1, 60, version=1) + linesep
+        chunks = [hd.encode() + encode_binary_frame([(1, 2, 3)], 1) + encode_record(RECORD_DELTA, b"")]
+
+        dr = DataReader(lambda: chunks.pop() if chunks else b"")
+        with pytest.raises(ValueError):
+            dr.update()
+
+    def test_threaded(self):
+        data = header(led_count=2, fps=60) + 0 + "text" + 1
+        chunks = queue.Queue()
+        chunks.put(data.read())
+
+        with DataReader(chunks.get, threaded=True) as dr:
+            wait_until(lambda: len(dr.frames) == 2)
+            assert next(dr) == data.jelka[0]
+            assert next(dr) == data.jelka[1]
+            assert not dr.eof
+
+            data + 2
+            chunks.put(data.read())
+            wait_until(lambda: dr.frames.end == 3)
+            assert next(dr) == data.jelka[2]
+
+            chunks.put(b"")
+            wait_until(lambda: dr.eof)
+            assert next(dr) == data.jelka[2]
+
+        assert not dr.thread.is_alive()
+
+    def test_threaded_error(self):
+        data = header(led_count=2, fps=60)
+        data.entries.append("#Invalid frame" + linesep)
+        chunks = [b"", data.read()]
+
+        dr = DataReader(chunks.pop, threaded=True)
+        dr.start()
+        wait_until(lambda: dr.eof)
+
+        with pytest.raises(ValueError):
+            next(dr)
+
+    def test_threaded_error_once(self):
+        data = header(led_count=2, fps=60)
+        data.entries.append("#zz" + linesep)
+        data + 0 + 1
+        chunks = queue.Queue()
+        chunks.put(data.read())
+
+        with DataReader(chunks.get, threaded=True) as dr:
+            wait_until(lambda: dr.frames.end == 2)
+            with pytest.raises(ValueError):
+                dr.update()
+            # the error is raised once, the thread goes on reading
+            assert next(dr) == data.jelka[0]
+            assert next(dr) == data.jelka[1]
+
+            data + 2
+            chunks.put(data.read())
+            wait_until(lambda: dr.frames.end == 3)
+            assert next(dr) == data.jelka[2]
+            assert dr.thread is not None and dr.thread.is_alive()
+            chunks.put(b"")
+
+    def test_threaded_block(self):
+        data = header(led_count=2, fps=60)
+        for i in range(10):
+            data + i
+        chunks = queue.Queue()
+        chunks.put(data.read())
+        chunks.put(b"")
+
+        with DataReader(chunks.get, capacity=3, policy="block", threaded=True) as dr:
+            wait_until(lambda: len(dr.frames) == 3)
+            assert not dr.eof
+            for i in range(10):
+                # the thread takes the next frame once there is space
+                wait_until(lambda i=i: dr.frames.end > i)
+                assert next(dr) == data.jelka[i]
+                assert len(dr.frames) <= 3
+            wait_until(lambda: dr.eof)
+
+    def test_readinto(self):
+        data = header(led_count=2, fps=60) + "text" + 0 + 1 + 2
+        stream = io.BytesIO(data.as_bytes())
+
+        dr = DataReader(readinto=readinto_function(stream), buffer_size=16)
+        while stream.tell() < len(stream.getvalue()):
+            dr.update()
+        assert dr.frames == data.jelka
+        assert dr.bytes_reader.user_buffer == b"text"
+        assert len(dr.read_buffer) == 16
+
+    def test_readinto_pipe(self):
+        data = header(led_count=2, fps=60) + 0 + 1
+        read_fd, write_fd = os.pipe()
+        os.write(write_fd, data.as_bytes())
+        os.close(write_fd)
+
+        with DataReader(readinto=readinto_function(read_fd), threaded=True) as dr:
+            wait_until(lambda: dr.eof)
+            assert dr.frames == data.jelka
+        os.close(read_fd)
+
+    def test_readinto_socket(self):
+        data = header(led_count=2, fps=60) + 0
+        a, b = socket.socketpair()
+        with a, b:
+            a.sendall(data.as_bytes())
+            dr = DataReader(readinto=readinto_function(b))
+            assert next(dr) == data.jelka[0]
+
+    def test_input_arguments(self):
+        with pytest.raises(ValueError):
+            DataReader()
+        with pytest.raises(ValueError):
+            DataReader(lambda: b"", readinto=lambda buffer: 0)
+        with pytest.raises(TypeError):
+            readinto_function("not a stream")
+
+    def test_stats(self):
+        data = header(led_count=2, fps=10) + 0 + "abc" + 1 + 2 + 3
+        size = len(data.as_bytes())
+        clock = FakeClock()
+
+        dr = DataReader(data.read, capacity=3, realtime=True, clock=clock, stats=True)
+        assert next(dr) == data.jelka[1]
+        clock.now += 0.35
+        assert next(dr) == data.jelka[3]
+
+        stats = dr.stats
+        assert stats.bytes_read == size
+        assert stats.chunks_read == 1
+        assert stats.frames_parsed == 4
+        assert stats.frames_returned == 2
+        assert stats.frames_dropped == 1
+        assert stats.frames_skipped == 1
+        assert stats.queue_size == 3
+        assert stats.user_buffer_size == 3
+        assert stats.jelka_buffer_size == 0
+        assert stats.max_jelka_buffer_size > 0
+        assert stats.lag == 0
+        assert stats.read_time > 0 and stats.parse_time > 0 and stats.decode_time > 0
+
+    def test_stats_disabled(self):
+        data = header(led_count=2, fps=60) + 0
+
+        dr = DataReader(data.read)
+        assert next(dr) == data.jelka[0]
+        assert dr.stats is None
+
+    def test_callbacks(self):
+        data = header(led_count=2, fps=60) + 0 + 1
+        data.entries.append("#Invalid frame" + linesep)
+        events = []
+
+        dr = DataReader(
+            data.read,
+            stats=True,
+            on_header=lambda header: events.append(header["led_count"]),
+            on_frame=lambda frame: events.append(frame),
+            on_parse_error=lambda error: events.append(type(error)),
+        )
+        with pytest.raises(ValueError):
+            dr.update()
+        assert events == [2, ValueError]
+        assert dr.stats.parse_errors == 1
+
+    def test_recover_after_error(self):
+        data = header(led_count=1, fps=60) + 0
+        data.entries.append("#Invalid frame" + linesep)
+        data + 1
+
+        dr = DataReader(data.read)
+        with pytest.raises(ValueError):
+            dr.update()
+        # only the invalid line was removed
+        dr.update()
+        assert dr.frames == [data.jelka[0], data.jelka[1]]
+
+    def test_tolerant(self):
+        data = header(led_count=1, fps=60)
+        data.entries.insert(0, "#Invalid header" + linesep)
+        data + 0
+        data.entries.append("#Invalid frame" + linesep)
+        data.entries.append("#abcdeg" + linesep)  # right size, but not hex
+        data + 1
+        data.entries.append("#00" + linesep)
+        errors = []
+
+        dr = DataReader(data.read, tolerant=True, on_parse_error=errors.append)
+        assert next(dr) == data.jelka[0]
+        assert next(dr) == data.jelka[0]  # the frame that can not be decoded
+        assert next(dr) == data.jelka[1]
+        assert next(dr) == data.jelka[1]
+        assert dr.header == {"version": 0, "led_count": 1, "fps": 60}
+        assert dr.bytes_reader.error_count == 4
+        assert all(isinstance(error, ValueError) for error in errors)
+
+    def test_tolerant_header_not_object(self):
+        data = header(led_count=1, fps=60) + 0
+        data.entries[0:0] = ["#5" + linesep, "#null" + linesep]
+        errors = []
+
+        dr = DataReader(data.read, tolerant=True, on_parse_error=errors.append)
+        assert next(dr) == data.jelka[0]
+        assert dr.header == {"version": 0, "led_count": 1, "fps": 60}
+        assert len(errors) == 2
+        assert all(isinstance(error, ValueError) for error in errors)
+
+    def test_duplicate_frames(self):
+        data = header(led_count=3, fps=60) + 0 + 0 + 0 + 1 + 1
+
+        dr = DataReader(data.read)
+        dr.update()
+        frames = list(dr.frames)
+        assert frames[0] is frames[1] is frames[2]
+        assert frames[3] is frames[4] and frames[3] is not frames[0]
+        assert dr.bytes_reader.duplicates == 3
+
+        unchanged = []
+        for i in range(6):
+            assert next(dr) == data.jelka[min(i, 4)]
+            unchanged.append(dr.unchanged)
+        # the last frame is returned again, there is nothing newer
+        assert unchanged == [False, True, True, False, True, True]
+
+    def test_duplicate_chunks(self):
+        # the previous line is compared in the buffer, so it works across reads
+        data = header(led_count=2, fps=60) + 5
+        line = data.entries[-1]
+        chunks = [data.read(), line.encode()[:3], line.encode()[3:] + line.encode()]
+
+        dr = DataReader(lambda: chunks.pop(0) if chunks else b"")
+        first = next(dr)
+        assert next(dr) is first and next(dr) is first
+        assert dr.bytes_reader.duplicates == 2
+
+    def test_duplicate_invalid_frame(self):
+        data = header(led_count=1, fps=60)
+        data.entries.append("#abcdeg" + linesep)
+        data.entries.append("#abcdeg" + linesep)
+
+        dr = DataReader(data.read)
+        with pytest.raises(ValueError):
+            next(dr)
+        with pytest.raises(ValueError):
+            next(dr)
+
+    def test_stages(self):
+        data = header(led_count=2, fps=60) + 0 + 1
+        calls = []
+
+        def invert(frame):
+            calls.append(frame)
+            return Frame(bytes(255 - value for value in frame.data))
+
+        dr = DataReader(data.read, stages=[invert, OutputTransform(order="bgr")])
+        inverted = [[tuple(255 - value for value in color[::-1]) for color in frame] for frame in data.jelka]
+        assert next(dr) == inverted[0]
+        assert next(dr) == inverted[1]
+        assert next(dr) == inverted[1]  # the same frame is not transformed again
+        assert next(dr) is dr.current_frame
+        assert calls == data.jelka
+
+    def test_stages_tolerant(self):
+        data = header(led_count=1, fps=60) + 0
+        data.entries.append("#abcdeg" + linesep)
+
+        dr = DataReader(data.read, tolerant=True, stages=[OutputTransform(brightness=0)])
+        assert next(dr) == [(0, 0, 0)]
+        # the previous frame is shown instead of the invalid one, it is not transformed twice
+        assert next(dr) is dr.current_frame == [(0, 0, 0)]
+
+    def test_tolerant_records(self):
+        data = header(led_count=2, fps=60)
+        data.entries[0] = "#" + encode_header(2, 60, version=1) + linesep
+        raw = data.as_bytes() + encode_binary_frame(random_frame(2, 0), 2)
+        raw += encode_record(RECORD_DELTA, b"\x00") + encode_binary_frame([(1, 2, 3)] * 3, 3)
+        raw += encode_binary_frame(random_frame(2, 1), 2)
+
+        reader = BytesReader(tolerant=True)
+        reader.read_more(raw)
+        reader.try_get_header()
+        assert reader.try_get_frames() == [random_frame(2, 0), random_frame(2, 1)]
+        assert reader.error_count == 2
+        assert reader.jelka_buffer == b""
+
+
+class TestBytesReader:
+    def test_strict_keeps_parsed_frames(self):
+        hd = "#" + encode_header(2, 60, version=1, encodings=["delta", "repeat"]) + linesep
+        a, b, c = bytes(6), bytes([0, 0, 0, 1, 1, 1]), bytes([2, 2, 2, 1, 1, 1])
+        data = hd.encode() + encode_binary_frame(a, 2)
+        data += encode_record(RECORD_DELTA, encode_delta(b, a)) + encode_record(RECORD_REPEAT, b"")
+        data += encode_record(RECORD_DELTA, encode_delta(c, b))
+        data += encode_record(RECORD_RAW, b"\x00") + encode_binary_frame(c, 2)
+        parsed = []
+
+        reader = BytesReader(on_frame=parsed.append)
+        reader.read_more(data)
+        reader.try_get_header()
+        with pytest.raises(ValueError):
+            reader.try_get_frames()
+        # the frames before the invalid record are not parsed again
+        assert reader.try_get_frames(limit=1) == [Frame(a)]
+        assert reader.try_get_frames() == [Frame(b), Frame(b), Frame(c), Frame(c)]
+        assert parsed == [Frame(a), Frame(b), Frame(b), Frame(c), Frame(c)]
+        assert reader.duplicates == 1
+        assert reader.jelka_buffer == b""
+
+    @pytest.mark.parametrize("split", [False, True])
+    def test_corrupt_record_length(self, split):
+        hd = ("#" + encode_header(2, 60, version=1) + linesep).encode()
+        rest = encode_binary_frame(bytes(6), 2) + b"#\x01\xff\xff\xff\xffuser" + encode_binary_frame(bytes([1] * 6), 2)
+
+        reader = BytesReader(tolerant=True)
+        if split:
+            reader.read_more(hd)
+            reader.try_get_header()
+            reader.read_more(rest)
+        else:
+            reader.read_more(hd + rest)
+            reader.try_get_header()
+        assert reader.try_get_frames() == [Frame(bytes(6)), Frame(bytes([1] * 6))]
+        assert reader.error_count == 1
+        assert reader.user_buffer == b"user"
+
+    def test_duplicate_records(self):
+        hd = "#" + encode_header(2, 60, version=1, encodings=["delta", "rle"]) + linesep
+        frame = [(1, 2, 3), (4, 5, 6)]
+        changed = encode_record(RECORD_DELTA, encode_delta(bytes([1, 2, 3, 7, 8, 9]), bytes([1, 2, 3, 4, 5, 6])))
+
+        reader = BytesReader()
+        reader.read_more(hd.encode() + encode_binary_frame(frame, 2) * 2 + changed + encode_binary_frame(frame, 2))
+        reader.try_get_header()
+        frames = reader.try_get_frames()
+        assert frames == [frame, frame, [(1, 2, 3), (7, 8, 9)], frame]
+        assert frames[0] is frames[1]
+        # the raw record after the delta is not the same frame as the last one
+        assert frames[3] is not frames[2]
+        assert reader.duplicates == 1
+
+    def test_chunks(self):
+        data = header(led_count=3, fps=60) + "abc" + 0 + "Random text" + linesep + 1 + 2 + "jabfhsb"
+        bs = data.as_bytes()
+
+        whole = BytesReader()
+        whole.read_more(bs)
+
+        for size in (1, 2, 3, 7, 64):
+            br = BytesReader()
+            for i in range(0, len(bs), size):
+                br.read_more(bs[i : i + size])
+
+            assert br.jelka_buffer == whole.jelka_buffer
+            assert br.user_buffer == whole.user_buffer
+            assert br.mode == whole.mode
+
+        assert whole.try_get_header() is not None
+        assert whole.try_get_frames() == [data.jelka[0], data.jelka[1], data.jelka[2]]
+
+    def test_split_linesep(self, monkeypatch):
+        monkeypatch.setattr(datareader, "linesepb", b"\r\n")
+
+        br = BytesReader()
+        br.read_more(b"#00\r")
+        assert br.mode == "jelka"
+        br.read_more(b"\nabc\r\n#01")
+        assert br.mode == "jelka"
+        assert br.jelka_buffer == b"#00\r\n#01"
+        assert br.user_buffer == b"abc\r\n"
+
+    def test_linesep_not_split(self, monkeypatch):
+        monkeypatch.setattr(datareader, "linesepb", b"\r\n")
+
+        br = BytesReader()
+        br.read_more(b"#00\r")
+        br.read_more(b"0\r\n")
+        assert br.mode == "user"
+        assert br.jelka_buffer == b"#00\r0\r\n"
+
+    def test_size(self):
+        data = (header(led_count=3, fps=60) + "abc" + 0 + 1).as_bytes()
+        buffer = bytearray(7)
+
+        br = BytesReader()
+        for i in range(0, len(data), 5):
+            chunk = data[i : i + 5]
+            buffer[: len(chunk)] = chunk
+            buffer[len(chunk) :] = b"#" * (len(buffer) - len(chunk))  # garbage after the data
+            br.read_more(buffer, len(chunk))
+
+        whole = BytesReader()
+        whole.read_more(data)
+        assert br.jelka_buffer == whole.jelka_buffer
+        assert br.user_buffer == b"abc"
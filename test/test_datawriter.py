@@ -0,0 +1,173 @@
+import io
+
+import pytest
+
+from src.jelka_validator import DataReader, Frame
+from src.jelka_validator.datawriter import DataWriter
+
+from .test_datareader import FakeClock
+
+
+def read_all(bs):
+    chunks = [bs]
+    dr = DataReader(lambda: chunks.pop() if chunks else b"")
+    dr.update()
+    return dr
+
+
+class TestDataWriter:
+    def test_version_0(self, capfdbinary):
+        frames = [[(i, 2 * i, 255 - i)] * 3 for i in range(5)]
+
+        dw = DataWriter(led_count=3, fps=30)
+        for frame in frames:
+            dw.write_frame(frame)
+
+        out, _ = capfdbinary.readouterr()
+        dr = read_all(out)
+        assert dr.header == {"version": 0, "led_count": 3, "fps": 30}
+        assert dr.frames == frames
+
+    def test_version_1(self, capfdbinary):
+        frames = [[(i, 10, 35)] * 3 for i in range(5)]
+
+        dw = DataWriter(led_count=3, fps=30, version=1)
+        for frame in frames:
+            print("user output")
+            dw.write_frame(frame)
+
+        out, _ = capfdbinary.readouterr()
+        dr = read_all(out)
+        assert dr.header == {"version": 1, "led_count": 3, "fps": 30}
+        assert dr.frames == frames
+        assert dr.bytes_reader.user_buffer.count(b"user output") == 5
+
+    def test_encodings(self, capfdbinary):
+        frames = [[(1, 2, 3)] * 50] * 3
+        frames.append([(1, 2, 3)] * 10 + [(4, 5, 6)] + [(1, 2, 3)] * 39)
+        frames.append([(i, i, i) for i in range(50)])
+        frames.append(frames[-1])
+
+        dw = DataWriter(led_count=50, fps=30, version=1, encodings=["delta", "rle", "repeat"])
+        for frame in frames:
+            dw.write_frame(frame)
+
+        out, _ = capfdbinary.readouterr()
+        assert len(out) < 50 * 3 + 200
+        dr = read_all(out)
+        assert dr.header is not None
+        assert dr.header["encodings"] == ["delta", "rle", "repeat"]
+        assert dr.frames == frames
+        assert dr.frames[1] is dr.frames[0]
+
+    def test_stream_buffering(self):
+        stream = io.BytesIO()
+        frames = [[(i, 0, 255)] * 4 for i in range(10)]
+
+        with DataWriter(led_count=4, fps=60, stream=stream, buffer_size=100, autoflush=False) as dw:
+            dw.write_frame(frames[0])
+            assert stream.getvalue() == b""
+            for frame in frames[1:]:
+                dw.write_frame(frame)
+            assert 0 < len(stream.getvalue()) < 10 * 4 * 6
+
+        assert read_all(stream.getvalue()).frames == frames
+
+    def test_frame_types(self):
+        numpy = pytest.importorskip("numpy")
+        stream = io.BytesIO()
+        frame = [(0, 1, 2), (250, 251, 252)]
+        data = bytes((0, 1, 2, 250, 251, 252))
+
+        dw = DataWriter(led_count=2, fps=60, stream=stream)
+        dw.write_frame(data)
+        dw.write_frame(bytearray(data))
+        dw.write_frame(memoryview(data))
+        dw.write_frame(Frame(data))
+        dw.write_frame(numpy.array(frame, dtype=numpy.uint8))
+        dw.write_frame(numpy.array(frame))
+
+        assert read_all(stream.getvalue()).frames == [frame] * 6
+
+    def test_invalid_frames(self):
+        numpy = pytest.importorskip("numpy")
+        dw = DataWriter(led_count=2, fps=60, stream=io.BytesIO())
+
+        for frame in (
+            [(0, 0, 0)],
+            [(0, 0, 0), (0, 0)],
+            [(0, 0, 0), (0, 0, 256)],
+            [(0, 0, 0), (0, 0, 0.5)],
+            bytes(5),
+            numpy.zeros((2, 2)),
+            numpy.zeros((2, 3)),
+            numpy.full((2, 3), -1),
+        ):
+            with pytest.raises(ValueError):
+                dw.write_frame(frame)
+
+    def paced_writer(self, late_policy):
+        clock = FakeClock()
+        dw = DataWriter(
+            led_count=1, fps=10, stream=io.BytesIO(), paced=True, late_policy=late_policy, clock=clock, sleep=clock.sleep
+        )
+        return dw, clock
+
+    def test_paced(self):
+        dw, clock = self.paced_writer("catch_up")
+
+        times = []
+        for i in range(5):
+            assert dw.write_frame([(i, i, i)])
+            times.append(clock.now)
+            clock.now += 0.01
+
+        assert times == pytest.approx([0, 0.1, 0.2, 0.3, 0.4])
+        assert dw.overruns == 0
+
+    def test_paced_catch_up(self):
+        dw, clock = self.paced_writer("catch_up")
+
+        dw.write_frame([(0, 0, 0)])
+        clock.now = 0.35
+        for _ in range(4):
+            assert dw.write_frame([(0, 0, 0)])
+
+        # frames 1, 2 were late, 3 was still in its slot, 4 waited
+        assert dw.overruns == 2
+        assert clock.now == pytest.approx(0.4)
+
+    def test_paced_drop(self):
+        dw, clock = self.paced_writer("drop")
+
+        dw.write_frame([(0, 0, 0)])
+        clock.now = 0.35
+        written = [dw.write_frame([(0, 0, 0)]) for _ in range(4)]
+
+        # frame 1 was dropped, the others got the slots from 0.3 on
+        assert written == [False, True, True, True]
+        assert dw.overruns == dw.dropped_frames == 1
+        assert dw.frame_count == 4
+        assert clock.now == pytest.approx(0.5)
+
+    def test_paced_drop_long_pause(self):
+        dw, clock = self.paced_writer("drop")
+
+        dw.write_frame([(0, 0, 0)])
+        clock.now = 10.05
+        written = [dw.write_frame([(0, 0, 0)]) for _ in range(3)]
+
+        assert written == [False, True, True]
+        assert dw.dropped_frames == 1
+        assert clock.now == pytest.approx(10.1)
+
+    def test_paced_reschedule(self):
+        dw, clock = self.paced_writer("reschedule")
+
+        dw.write_frame([(0, 0, 0)])
+        clock.now = 0.35
+        assert dw.write_frame([(0, 0, 0)])
+        assert dw.write_frame([(0, 0, 0)])
+
+        assert dw.overruns == 1
+        assert clock.now == pytest.approx(0.45)
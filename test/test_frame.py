@@ -0,0 +1,52 @@
+import pytest
+
+from src.jelka_validator import Frame
+from src.jelka_validator.utils import decode_frame, encode_frame
+
+
+class TestFrame:
+    def test_sequence(self):
+        frame = Frame(bytearray([0, 1, 2, 3, 4, 5, 250, 251, 252]))
+
+        assert len(frame) == 3
+        assert frame[0] == (0, 1, 2)
+        assert frame[-1] == (250, 251, 252)
+        assert frame[1:] == [(3, 4, 5), (250, 251, 252)]
+        assert list(frame) == [(0, 1, 2), (3, 4, 5), (250, 251, 252)]
+
+        with pytest.raises(IndexError):
+            frame[3]
+
+    def test_equality(self):
+        frame = Frame(bytes([0, 1, 2, 3, 4, 5]))
+
+        assert frame == Frame(bytearray([0, 1, 2, 3, 4, 5]))
+        assert frame == [(0, 1, 2), (3, 4, 5)]
+        assert [(0, 1, 2), (3, 4, 5)] == frame
+        assert frame != [(0, 1, 2)]
+        assert frame != [(0, 1, 2), (3, 4, 6)]
+        assert Frame.black(2) == [(0, 0, 0)] * 2
+
+    def test_invalid_size(self):
+        with pytest.raises(ValueError):
+            Frame(bytes(4))
+
+    def test_array(self):
+        numpy = pytest.importorskip("numpy")
+
+        frame = decode_frame("0001020304050096ff", 3, version=0)
+        assert frame.array.shape == (3, 3)
+        assert frame.array.dtype == numpy.uint8
+        assert frame.array[2].tolist() == [0, 150, 255]
+
+    def test_decode_invalid(self):
+        with pytest.raises(ValueError):
+            decode_frame("0001020304050096fg", 3, version=0)
+        with pytest.raises(ValueError):
+            decode_frame(b"00 01020304050096f", 3, version=0)
+        with pytest.raises(ValueError):
+            decode_frame("00 01020304050096f", 3, version=0)
+
+    def test_roundtrip(self):
+        colors = [(i, 255 - i, i // 2) for i in range(256)]
+        assert decode_frame(encode_frame(colors, 256).encode(), 256, version=0) == colors
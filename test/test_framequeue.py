@@ -0,0 +1,87 @@
+import pytest
+
+from src.jelka_validator.framequeue import FrameQueue
+
+
+class TestFrameQueue:
+    def test_unbounded(self):
+        queue = FrameQueue()
+        queue.extend(range(1000))
+
+        assert len(queue) == 1000
+        assert queue.space() is None
+        assert queue.dropped == 0
+
+    def test_drop_oldest(self):
+        queue = FrameQueue(capacity=3)
+        queue.extend(range(5))
+
+        assert queue == [2, 3, 4]
+        assert queue.start == 2
+        assert queue.end == 5
+        assert queue.dropped == 2
+        assert queue.get(3) == 3
+        with pytest.raises(IndexError):
+            queue.get(1)
+
+    def test_consumed_not_dropped(self):
+        queue = FrameQueue(capacity=3)
+        queue.extend(range(3))
+        queue.consume(2)
+        queue.extend([3, 4])
+
+        assert queue == [2, 3, 4]
+        assert queue.dropped == 0
+
+    def test_release_unbounded(self):
+        queue = FrameQueue()
+        queue.extend(range(5))
+        queue.consume(3)
+
+        # frames 0 and 1 are removed, frame 2 (the last consumed) is kept until space is needed
+        assert queue == [2, 3, 4]
+        assert queue.dropped == 0
+
+    def test_latest(self):
+        queue = FrameQueue(policy="latest")
+        queue.extend(range(4))
+        queue.consume(4)
+        queue.append(4)
+
+        assert queue == [4]
+        assert queue.start == 4
+        assert queue.dropped == 3
+
+    def test_block(self):
+        queue = FrameQueue(capacity=2, policy="block")
+
+        assert queue.space() == 2
+        assert queue.append(0)
+        assert queue.append(1)
+        assert queue.space() == 0
+        assert not queue.append(2)
+        assert queue == [0, 1]
+
+        queue.consume(1)
+        assert queue.space() == 1
+        assert queue.append(2)
+        assert queue == [1, 2]
+        assert queue.dropped == 0
+
+    def test_keeps_last(self):
+        queue = FrameQueue(capacity=1, policy="block")
+        queue.append(0)
+        queue.consume(1)
+
+        # the last consumed frame is kept, but a new frame can replace it
+        assert queue.space() == 1
+        assert queue == [0]
+        assert queue.append(1)
+        assert queue == [1]
+        assert queue.space() == 0
+
+    def test_invalid(self):
+        with pytest.raises(ValueError):
+            FrameQueue(capacity=0)
+        with pytest.raises(ValueError):
+            FrameQueue(policy="abc")
@@ -0,0 +1,100 @@
+import os
+import sys
+
+import pytest
+
+from src.jelka_validator.multiplexer import END, ERROR, FRAME, HEADER, USER, Multiplexer
+from src.jelka_validator.utils import encode_header
+
+from .test_datareader import header
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="non-blocking pipes need POSIX")
+
+PATTERN = """
+import time
+from jelka_validator.datawriter import DataWriter
+writer = DataWriter(2, 60)
+for i in range({frames}):
+    print("frame", i, flush=True)
+    writer.write_frame([(i, i, i)] * 2)
+    time.sleep(0.01)
+"""
+
+
+def collect(events):
+    result = {}
+    for stream_id, kind, value in events:
+        result.setdefault(stream_id, []).append((kind, value))
+    return result
+
+
+class TestMultiplexer:
+    def test_processes(self):
+        with Multiplexer() as mux:
+            for i in range(3):
+                mux.add_process([sys.executable, "-c", PATTERN.format(frames=i + 2)], stream_id=i)
+            result = collect(mux.events(timeout=30))
+
+        assert sorted(result) == [0, 1, 2]
+        for i, events in result.items():
+            kinds = [kind for kind, _ in events]
+            assert kinds[-1] == END
+            assert events[-1][1] == 0
+            assert kinds.count(HEADER) == 1
+            frames = [value for kind, value in events if kind == FRAME]
+            assert frames == [[(j, j, j)] * 2 for j in range(i + 2)]
+            user = b"".join(value for kind, value in events if kind == USER)
+            assert user.decode().split() == " ".join(f"frame {j}" for j in range(i + 2)).split()
+
+    def test_error(self):
+        code = "import time; print('#' + HEADER); print('#00', flush=True); time.sleep(30)"
+        code = code.replace("HEADER", repr(encode_header(1, 60)))
+        with Multiplexer() as mux:
+            mux.add_process([sys.executable, "-c", code], stream_id="bad")
+            events = list(mux.events(timeout=30))
+
+        assert [kind for _, kind, _ in events] == [HEADER, ERROR, END]
+        assert isinstance(events[1][2], ValueError)
+        assert events[2][2] != 0  # killed
+
+    def test_invalid_frame(self):
+        code = "import time; print('#' + HEADER); print('#zzzzzz', flush=True); time.sleep(30)"
+        code = code.replace("HEADER", repr(encode_header(1, 60)))
+        with Multiplexer() as mux:
+            mux.add_process([sys.executable, "-c", code], stream_id="bad")
+            events = list(mux.events(timeout=30))
+
+        assert [kind for _, kind, _ in events] == [HEADER, ERROR, END]
+
+    def test_slow_exit(self):
+        """A process that closed its stdout does not stop the other streams."""
+
+        slow = "import os, time; os.close(1); time.sleep(3)"
+        with Multiplexer(exit_timeout=10) as mux:
+            mux.add_process([sys.executable, "-c", slow], stream_id="slow")
+            mux.add_process([sys.executable, "-c", PATTERN.format(frames=5)], stream_id="fast")
+            order = [(stream_id, kind) for stream_id, kind, _ in mux.events(timeout=30) if kind in (FRAME, END)]
+
+        assert order[-2:] == [("fast", END), ("slow", END)]
+        assert order.count(("fast", FRAME)) == 5
+
+    def test_timeout(self):
+        with Multiplexer() as mux:
+            mux.add_process([sys.executable, "-c", "import time; time.sleep(30)"], stream_id="slow")
+            events = list(mux.events(timeout=0.2))
+
+        assert events == [("slow", END, events[0][2])]
+
+    def test_pipe(self):
+        read_fd, write_fd = os.pipe()
+        data = (header(led_count=1, fps=60) + 0 + "text").as_bytes()
+
+        with Multiplexer() as mux:
+            mux.add_stream(read_fd, "pipe")
+            with pytest.raises(ValueError):
+                mux.add_stream(read_fd, "pipe")
+            os.write(write_fd, data)
+            os.close(write_fd)
+            result = collect(mux.events())
+
+        assert [kind for kind, _ in result["pipe"]] == [USER, HEADER, FRAME, END]
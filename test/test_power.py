@@ -0,0 +1,81 @@
+from os import linesep
+from random import Random
+
+import pytest
+
+from src.jelka_validator import DataReader, Frame, power
+from src.jelka_validator.power import PowerLimiter
+from src.jelka_validator.utils import encode_header
+
+NUMPY_MODULE = power  # see the backend fixture in conftest
+
+
+def random_data(led_count, seed):
+    rnd = Random(seed)
+    return bytes(rnd.randint(0, 255) for _ in range(3 * led_count))
+
+
+class TestPowerLimiter:
+    def test_current(self, backend):
+        limiter = PowerLimiter(channel_ma=(10, 20, 30), idle_ma=1)
+        assert limiter.current(bytes([255, 0, 0, 0, 255, 255])) == pytest.approx(2 + 10 + 20 + 30)
+        assert limiter.current(bytes([51, 102, 0])) == pytest.approx(1 + 2 + 8)
+        assert limiter.current(b"") == 0
+
+    def test_under_budget(self, backend):
+        limiter = PowerLimiter(budget_ma=1000)
+        frame = Frame(bytes([10] * 30))
+        assert limiter(frame) is frame
+        assert (limiter.frames, limiter.limited) == (1, 0)
+        assert limiter.last_current == pytest.approx(10 + 10 * 60 * 10 / 255)
+
+    def test_budget(self, backend):
+        limiter = PowerLimiter(budget_ma=3000, channel_ma=(12, 15, 20), idle_ma=0.5)
+        for seed in range(10):
+            data = random_data(300, seed)
+            out = limiter(Frame(data)).data
+            assert limiter.current(out) <= 3000
+            # values are rounded down, so a bit less is used
+            assert limiter.current(out) == pytest.approx(3000, rel=0.02)
+            assert all(b <= a for a, b in zip(data, out))
+        assert (limiter.frames, limiter.limited) == (10, 10)
+        assert limiter.max_current > 3000
+
+    def test_segments(self, backend):
+        segments = [(0, 10, 100), (10, 20, 1000)]
+        limiter = PowerLimiter(segments=segments, idle_ma=1)
+        data = bytes([255] * 60 + [255] * 30)
+        out = limiter(Frame(data)).data
+
+        assert limiter.current(out[:30]) <= 100
+        assert limiter.current(out[:30]) == pytest.approx(100, rel=0.01)
+        assert out[30:] == data[30:]  # the second segment and leds outside segments are not limited
+        assert limiter.limited == 1
+
+    def test_segments_and_budget(self, backend):
+        limiter = PowerLimiter(budget_ma=300, segments=[(0, 10, 100)], idle_ma=0)
+        out = limiter(Frame(bytes([255] * 60))).data
+        assert limiter.current(out[:30]) <= 100
+        assert limiter.current(out) <= 300
+        assert limiter.current(out) == pytest.approx(300, rel=0.01)
+        # the segment is scaled more than the rest
+        assert out[0] < out[-1]
+
+    def test_budget_below_idle(self, backend):
+        limiter = PowerLimiter(budget_ma=5, idle_ma=1)
+        assert limiter(Frame(bytes([200] * 30))).data == bytes(30)
+
+    def test_stage(self):
+        data = "".join("#" + line + linesep for line in [encode_header(2, 60), "ffffffffffff"]).encode()
+        limiter = PowerLimiter(budget_ma=60, idle_ma=0)
+        dr = DataReader(iter([data]).__next__, stages=[limiter])
+        frame = next(dr)
+        assert frame is not None
+        assert limiter.current(frame.data) <= 60
+        assert limiter.limited == 1
+
+    def test_invalid(self):
+        with pytest.raises(ValueError):
+            PowerLimiter(channel_ma=(1, 2))
+        with pytest.raises(ValueError):
+            PowerLimiter(segments=[(5, 2, 100)])
@@ -20,6 +20,7 @@ if __name__ == "__main__":
             c = next(dr)
             assert all(c[i] == c[0] for i in range(len(c)))
             dr.user_print()
-            sim.set_colors(dict(zip(range(len(c)), c)))
+            if not dr.unchanged:
+                sim.set_colors(c)
             sim.frame()
         sim.quit()
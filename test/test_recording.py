@@ -0,0 +1,84 @@
+import pytest
+
+from src.jelka_validator import DataReader
+from src.jelka_validator.recording import INDEX_SUFFIX, Recorder, Replay
+
+from .test_datareader import random_frame
+
+
+def record(path, frames, version=1):
+    with Recorder(str(path), led_count=3, fps=10, version=version) as recorder:
+        for frame in frames:
+            recorder.write_frame(frame)
+
+
+class TestRecording:
+    @pytest.mark.parametrize("version", [0, 1])
+    def test_replay(self, tmp_path, version):
+        frames = [random_frame(3, i) for i in range(5)]
+        record(tmp_path / "show", frames, version)
+
+        with Replay(str(tmp_path / "show")) as replay:
+            assert replay.header == {"version": version, "led_count": 3, "fps": 10}
+            assert len(replay) == 5
+            assert list(replay) == frames
+            assert replay[-1] == frames[4]
+
+    def test_seek(self, tmp_path):
+        frames = [random_frame(3, i) for i in range(30)]
+        record(tmp_path / "show", frames)
+
+        with Replay(str(tmp_path / "show")) as replay:
+            replay.seek(7)
+            assert next(replay) == frames[7]
+            replay.seek_time(2.5)
+            assert next(replay) == frames[25]
+            assert replay.tell_time() == 2.6
+            replay.seek(100)
+            with pytest.raises(StopIteration):
+                next(replay)
+
+    def test_loop(self, tmp_path):
+        frames = [random_frame(3, i) for i in range(3)]
+        record(tmp_path / "show", frames)
+
+        with Replay(str(tmp_path / "show"), loop=True) as replay:
+            assert [next(replay) for _ in range(5)] == frames + frames[:2]
+
+    def test_unfinished(self, tmp_path):
+        frames = [random_frame(3, i) for i in range(3)]
+        record(tmp_path / "show", frames)
+        # the last frame is cut off, but is still in the index
+        path = tmp_path / "show"
+        path.write_bytes(path.read_bytes()[:-2])
+
+        with Replay(str(path)) as replay:
+            assert len(replay) == 3
+            assert replay[1] == frames[1]
+            with pytest.raises(ValueError):
+                replay[2]
+
+        with open(str(path) + INDEX_SUFFIX, "ab") as index:
+            index.write((10**6).to_bytes(8, byteorder="little"))
+        with Replay(str(path)) as replay:
+            assert len(replay) == 3
+
+    def test_data_reader(self, tmp_path):
+        """Recordings are normal streams."""
+
+        frames = [random_frame(3, i) for i in range(3)]
+        record(tmp_path / "show", frames)
+
+        with open(tmp_path / "show", "rb") as file:
+            reader = DataReader(file.read)
+            assert [next(reader) for _ in range(3)] == frames
+
+    def test_open_errors(self, tmp_path):
+        path = tmp_path / "show"
+        (tmp_path / ("show" + INDEX_SUFFIX)).mkdir()
+        with pytest.raises(OSError):
+            Recorder(str(path), led_count=3, fps=10)
+
+        path.write_bytes(b"not a recording\n")
+        with pytest.raises(ValueError):
+            Replay(str(path))
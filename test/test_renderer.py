@@ -0,0 +1,80 @@
+import io
+from os import linesep
+
+from numpy import array, uint8, zeros
+
+from jelka_validator import DataReader
+from jelka_validator.utils import encode_frame, encode_header
+
+from .renderer import Renderer, write_ppm, write_ppm_sequence, write_raw_video
+
+
+def center(renderer, i):
+    # the pixel where the center of led i is drawn
+    y, x = divmod(int(renderer.pixels[renderer.owner == i].mean().round()), renderer.width)
+    return y, x
+
+
+class TestRenderer:
+    def test_render(self):
+        renderer = Renderer({0: (0, 0, 100), 1: (50, 0, 100)}, width=100, height=80, radius=1)
+        image = renderer.render([(255, 0, 0), (0, 0, 255)])
+        assert image.shape == (80, 100, 3)
+        assert image.dtype == uint8
+
+        # the camera is at (0, -500, 100), so led 0 is in the middle of the screen
+        assert image[40, 50].tolist() == [255, 0, 0]
+        assert image[40, 60].tolist() == [0, 0, 255]
+        assert image[0, 0].tolist() == [0, 0, 0]
+        assert (image.reshape(-1, 3).any(axis=1)).sum() == 2 * 5
+
+    def test_nearer_covers_farther(self):
+        # both leds are projected to the middle, led 1 is nearer to the camera
+        renderer = Renderer(array([(0, 0, 100), (0, -250, 100)]), width=100, height=80, radius=2)
+        image = renderer.render(bytes([1, 1, 1, 2, 2, 2]))
+        assert image[40, 50].tolist() == [2, 2, 2]
+
+        renderer.set_view(3.14159, 0)  # turned around, led 0 is nearer now
+        image = renderer.render(bytes([1, 1, 1, 2, 2, 2]))
+        assert image[40, 50].tolist() == [1, 1, 1]
+
+    def test_behind_camera(self):
+        renderer = Renderer(array([(0, 0, 100), (0, -600, 100)]), width=100, height=80)
+        assert set(renderer.owner.tolist()) == {0}
+
+    def test_render_batch(self):
+        positions = array([(x, 0, z) for x in range(-60, 61, 20) for z in range(0, 201, 25)])
+        renderer = Renderer(positions, width=64, height=48, phi=0.4, tau=0.1)
+        frames = [bytes((i + j) % 256 for j in range(3 * len(positions))) for i in range(5)]
+
+        images = renderer.render_batch(frames)
+        assert images.shape == (5, 48, 64, 3)
+        for frame, image in zip(frames, images):
+            assert (renderer.render(frame) == image).all()
+
+    def test_render_reader(self):
+        led_count = 3
+        frames = [[(i, i, i)] * led_count for i in range(10)]
+        lines = [encode_header(led_count, 60)] + [encode_frame(frame, led_count) for frame in frames]
+        data = io.BytesIO("".join("#" + line + linesep for line in lines).encode())
+
+        renderer = Renderer({0: (0, 0, 100), 1: (20, 0, 100), 2: (-20, 0, 100)}, width=100, height=80)
+        reader = DataReader(data.read)
+        batches = list(renderer.render_reader(iter(reader), 10, batch_size=4))
+        assert [len(batch) for batch in batches] == [4, 4, 2]
+        assert [image[40, 50].tolist() for batch in batches for image in batch] == [[i, i, i] for i in range(10)]
+
+    def test_write_ppm(self, tmp_path):
+        image = zeros((2, 3, 3), dtype=uint8)
+        image[1, 2] = (1, 2, 3)
+        write_ppm(tmp_path / "a.ppm", image)
+        assert (tmp_path / "a.ppm").read_bytes() == b"P6\n3 2\n255\n" + bytes(15) + bytes([1, 2, 3])
+
+        paths = write_ppm_sequence(tmp_path, [image, image], start=7)
+        assert [path[-15:] for path in paths] == ["frame_00007.ppm", "frame_00008.ppm"]
+
+    def test_write_raw_video(self, tmp_path):
+        images = zeros((4, 2, 3, 3), dtype=uint8)
+        write_raw_video(tmp_path / "video.rgb", images)
+        write_raw_video(tmp_path / "video.rgb", [images[:2], images[2]])
+        assert len((tmp_path / "video.rgb").read_bytes()) == (4 + 3) * 2 * 3 * 3
@@ -0,0 +1,68 @@
+from os import linesep
+
+import pytest
+
+from src.jelka_validator import DataReader, Frame, resample
+from src.jelka_validator.resample import Resampler, crossfade
+from src.jelka_validator.utils import encode_frame, encode_header
+
+NUMPY_MODULE = resample  # see the backend fixture in conftest
+
+
+def gray(*values):
+    return [Frame(bytes([value] * 6)) for value in values]
+
+
+def firsts(resampler, count):
+    return [next(resampler)[0][0] for _ in range(count)]
+
+
+class TestResampler:
+    def test_crossfade(self, backend):
+        a, b = bytes(range(0, 256, 5)), bytes(range(255, -1, -5))
+        for weight in [0, 0.25, 0.5, 0.9, 1]:
+            expected = bytes(round(x * (1 - weight) + y * weight) for x, y in zip(a, b))
+            assert all(abs(x - y) <= 1 for x, y in zip(crossfade(a, b, weight), expected))
+        assert crossfade(a, b, 0) == a
+        assert crossfade(a, b, 1) == b
+
+        with pytest.raises(ValueError):
+            crossfade(a, b[:3], 0.5)
+
+    def test_modes(self, backend):
+        values = [0, 90, 180, 240]
+        assert firsts(Resampler(iter(gray(*values)), 90, 30, mode="hold"), 7) == [0, 0, 0, 90, 90, 90, 180]
+        assert firsts(Resampler(iter(gray(*values)), 90, 30, mode="nearest"), 7) == [0, 0, 90, 90, 90, 180, 180]
+        assert firsts(Resampler(iter(gray(*values)), 90, 30, mode="linear"), 7) == [0, 30, 60, 90, 120, 150, 180]
+
+    def test_no_copy(self):
+        frames = gray(0, 100, 200)
+        resampler = Resampler(iter(frames), 60, 30)
+        out = [next(resampler) for _ in range(5)]
+        assert out[0] is frames[0] and out[2] is frames[1] and out[4] is frames[2]
+        assert resampler.blended == 2
+
+    def test_downsample(self):
+        assert firsts(Resampler(iter(gray(*range(10))), 30, 60, mode="hold"), 5) == [0, 2, 4, 6, 8]
+        assert firsts(Resampler(iter(gray(*range(0, 100, 10))), 40, 60), 5) == [0, 15, 30, 45, 60]
+
+    def test_end(self):
+        resampler = Resampler(iter(gray(0, 100)), 60, 30)
+        assert firsts(resampler, 3) == [0, 50, 100]
+        with pytest.raises(StopIteration):
+            next(resampler)
+
+    def test_reader(self):
+        lines = [encode_header(2, 30)] + [encode_frame([(value, value, value)] * 2, 2) for value in [0, 100, 200]]
+        data = "".join("#" + line + linesep for line in lines).encode()
+        dr = DataReader(iter([data, b"", b"", b""]).__next__)
+
+        # fps is taken from the header
+        resampler = Resampler(dr, 60)
+        assert firsts(resampler, 5) == [0, 50, 100, 150, 200]
+
+    def test_invalid(self):
+        with pytest.raises(ValueError):
+            Resampler(iter([]), 60, mode="cubic")
+        with pytest.raises(ValueError):
+            Resampler(iter([]), 0)
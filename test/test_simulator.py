@@ -0,0 +1,71 @@
+import pytest
+from numpy import array, uint8
+
+from src.jelka_validator import DataReader
+
+from .simulator import Simulation, project, rotation
+from .test_datareader import header
+
+
+def old_proj(point, cam):
+    # projection of a single point, as it was done before vectorizing
+    dy = point[1] - cam[1]
+    if dy != 0:
+        return ((point[0] - cam[0]) / dy, (point[2] - cam[2]) / dy, dy)
+    return (0, 0, 1)
+
+
+class TestSimulation:
+    def test_project(self):
+        sim = Simulation()
+        r = rotation(0.3, 0.2)
+        points = sim.positions @ r.T
+        x, z, depth = project(points, sim.camera)
+
+        for i, point in enumerate(points):
+            assert (x[i], z[i], depth[i]) == pytest.approx(old_proj(r @ sim.positions[i], sim.camera))
+
+    def test_set_colors(self):
+        sim = Simulation({0: (0, 0, 0), 2: (1, 1, 1), 1: (2, 2, 2)})
+        assert sim.ids.tolist() == [0, 1, 2]
+
+        sim.set_colors(bytes([1, 1, 1, 2, 2, 2, 3, 3, 3, 4, 4, 4]))
+        assert sim.colors.tolist() == [[1, 1, 1], [2, 2, 2], [3, 3, 3]]
+
+        sim.set_colors([(5, 5, 5)])
+        assert sim.colors.tolist() == [[5, 5, 5], [0, 0, 0], [0, 0, 0]]
+
+        sim.set_colors(array([[6, 6, 6]] * 3, dtype=uint8))
+        assert sim.colors.tolist() == [[6, 6, 6]] * 3
+
+        sim.set_colors({2: (7, 7, 7)})
+        assert sim.colors.tolist() == [[0, 0, 0], [0, 0, 0], [7, 7, 7]]
+
+        with pytest.raises(ValueError):
+            sim.set_colors([(256, 0, 0)])
+        assert not sim.running
+
+    def test_unchanged_frames_keep_colors(self):
+        """The reading loop of test_pysim skips set_colors for unchanged frames."""
+
+        data = header(led_count=3, fps=60) + 0 + 0 + 1 + 1
+        dr = DataReader(data.read)
+        sim = Simulation({i: (i, 0, 0) for i in range(3)})
+        shown = []
+        for _ in range(4):
+            frame = next(dr)
+            if not dr.unchanged:
+                sim.set_colors(frame)
+            sim.project(100, 100)
+            shown.append(sim.colors.tolist())
+
+        assert shown == [[list(color) for color in frame] for frame in data.jelka]
+
+    def test_culling_and_wire(self):
+        # the camera is at y = -500, leds 2 and 3 are behind it
+        sim = Simulation({i: (0, y, 0) for i, y in enumerate([0, 10, -600, -700, 20, 30, 40])})
+        screen, _radii, visible = sim.project(100, 100)
+
+        assert visible.tolist() == [True, True, False, False, True, True, True]
+        assert [run.tolist() for run in sim.wire(visible)] == [[0, 1], [4, 5, 6]]
+        assert screen.shape == (7, 2)
@@ -0,0 +1,41 @@
+import pytest
+
+from src.jelka_validator import Frame
+from src.jelka_validator.transform import OutputTransform
+
+
+class TestOutputTransform:
+    def test_identity(self):
+        transform = OutputTransform()
+        assert transform.table is None
+        assert transform.apply(bytearray([1, 2, 3])) == b"\x01\x02\x03"
+
+    def test_table(self):
+        transform = OutputTransform(gamma=2.2, brightness=0.8)
+        expected = [round(255 * 0.8 * (value / 255) ** 2.2) for value in range(256)]
+        assert list(transform.table) == expected  # type: ignore
+        assert transform.apply(bytes(range(256))) == bytes(expected)
+
+    def test_rebuild(self):
+        transform = OutputTransform(gamma=2.0)
+        table = transform.table
+        assert transform.table is table  # cached
+        transform.order = "bgr"
+        assert transform.table is table  # the order does not change values
+        transform.brightness = 0.5
+        assert transform.table is not table
+        assert transform.table[255] == 128  # type: ignore
+
+    @pytest.mark.parametrize("order", ["rgb", "rbg", "grb", "gbr", "brg", "bgr"])
+    def test_order(self, order):
+        frame = Frame(bytes([1, 2, 3, 4, 5, 6]))
+        out = OutputTransform(order=order.upper())(frame)
+        assert list(out) == [tuple(dict(zip("rgb", color))[channel] for channel in order) for color in frame]
+
+    def test_invalid(self):
+        with pytest.raises(ValueError):
+            OutputTransform(order="rgg")
+        with pytest.raises(ValueError):
+            OutputTransform(gamma=0)
+        with pytest.raises(ValueError):
+            OutputTransform(brightness=1.5)
@@ -0,0 +1,83 @@
+import io
+from os import linesep
+
+import pytest
+
+from src.jelka_validator import DataReader
+from src.jelka_validator.datareader import BytesReader
+from src.jelka_validator.usersink import CallbackSink, FileSink, RingSink, UserSink
+
+from .test_datareader import header
+
+
+class TestUserSink:
+    def test_abstract(self):
+        with pytest.raises(TypeError):
+            UserSink()  # type: ignore
+
+    def test_split_character(self):
+        text = "žabe čepijo, ki šumijo\n"
+        data = text.encode()
+        received = []
+        sink = CallbackSink(received.append)
+
+        for i in range(len(data)):
+            sink.write(data[i : i + 1])
+        sink.flush()
+        assert "".join(received) == text
+
+    def test_invalid_utf8(self):
+        received = []
+        sink = CallbackSink(received.append)
+        sink.write(b"a\xffb")
+        sink.flush()
+        assert received == ["a�b"]
+
+    def test_long_line(self):
+        received = []
+        sink = CallbackSink(received.append, lines=True, max_line_length=4)
+        sink.write(b"abcdefghij")
+        assert received == ["abcd", "efgh"]
+        sink.write(b"\n")
+        assert received == ["abcd", "efgh", "ij\n"]
+
+    def test_file(self):
+        file = io.StringIO()
+        sink = FileSink(file, lines=True)
+        sink.write(b"one\ntw")
+        assert file.getvalue() == "one\n"
+        sink.flush()
+        assert file.getvalue() == "one\ntw"
+
+    def test_ring_is_bounded(self):
+        sink = RingSink(capacity=10)
+        for i in range(1000):
+            sink.write(f"line {i}\n".encode())
+
+        assert len(sink.ring) == 10
+        assert sink.truncated == 990
+        assert sink.pop()[-1] == "line 999\n"
+
+
+class TestReaderSink:
+    def test_data_reader(self):
+        data = header(led_count=1, fps=60) + "first" + linesep + 0 + "second" + linesep + "no newline"
+        sink = RingSink(capacity=2)
+
+        dr = DataReader(data.read, user_sink=sink)
+        assert next(dr) == data.jelka[0]
+        assert sink.pop() == ["first" + linesep, "second" + linesep]
+        assert dr.bytes_reader.user_buffer == b""
+        sink.flush()
+        assert sink.pop() == ["no newline"]
+
+    def test_user_print_split_character(self, capfd):
+        reader = BytesReader()
+        data = "čšž".encode()
+        reader.read_more(data[:3])
+        reader.user_print()
+        reader.read_more(data[3:])
+        reader.user_print()
+
+        out, _ = capfd.readouterr()
+        assert out == "čšž"
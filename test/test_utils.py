@@ -0,0 +1,69 @@
+from random import Random
+
+import pytest
+
+from src.jelka_validator import utils
+from src.jelka_validator.utils import apply_delta, decode_frame, decode_rle, encode_delta, encode_rle, led_differences
+
+NUMPY_MODULE = utils  # see the backend fixture in conftest
+
+
+class TestEncodings:
+    def test_led_differences(self, backend):
+        rnd = Random(7)
+        a = bytes(rnd.randrange(4) for _ in range(3 * 500))
+        b = bytes(rnd.randrange(4) for _ in range(3 * 500))
+        expected = bytes(int(a[i : i + 3] != b[i : i + 3]) for i in range(0, len(a), 3))
+
+        assert led_differences(a, b) == expected
+        assert led_differences(a, a) == bytes(500)
+        assert led_differences(b"", b"") == b""
+        with pytest.raises(ValueError):
+            led_differences(a, b[3:])
+
+    def test_rle_long_runs(self, backend):
+        data = bytes((1, 2, 3)) * 70000 + bytes((4, 5, 6))
+        payload = encode_rle(data)
+
+        assert payload is not None
+        assert len(payload) == 3 * 5
+        assert decode_rle(payload, 70001) == data
+
+    def test_rle_limit(self, backend):
+        data = bytes(range(30))
+        assert encode_rle(data, limit=len(data)) is None
+
+    def test_rle_oversized_count(self):
+        # a single run of MAX_RUN leds in a frame of 2 leds
+        with pytest.raises(ValueError):
+            decode_rle(b"\xff\xff\x01\x02\x03", 2)
+        with pytest.raises(ValueError):
+            decode_rle(b"\x00\x01\x01\x02\x03" + b"\xff\xff\x01\x02\x03" * 1000, 500)
+
+    def test_delta(self, backend):
+        previous = bytes(300)
+        data = bytearray(previous)
+        data[0:3] = b"\x01\x02\x03"
+        data[9:12] = b"\x04\x05\x06"
+        data[150:156] = b"\x07" * 6
+
+        payload = encode_delta(bytes(data), previous)
+        assert payload is not None
+        buffer = bytearray(previous)
+        apply_delta(buffer, payload)
+        assert buffer == data
+
+        assert encode_delta(bytes(data), previous, limit=10) is None
+        assert encode_delta(previous, previous) == b""
+
+    def test_delta_invalid(self):
+        with pytest.raises(ValueError):
+            apply_delta(bytearray(6), b"\x00\x00\x00\x01\x00\x02\x01\x02\x03\x04\x05\x06")
+        with pytest.raises(ValueError):
+            apply_delta(bytearray(6), b"\x00\x00")
+        with pytest.raises(ValueError):
+            decode_rle(b"\x00\x03\x01\x02\x03", 2)
+
+    def test_unsupported_version(self):
+        with pytest.raises(ValueError):
+            decode_frame(b"000000", 1, version=7)
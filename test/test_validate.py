@@ -0,0 +1,127 @@
+import sys
+from os import linesep
+
+from src.jelka_validator.utils import encode_binary_frame, encode_compressed_frame, encode_header, encode_record
+from src.jelka_validator.validate import Validator, main, validate_file, validate_files, validate_process
+
+from .test_datareader import header, random_frame
+
+
+def validate(data, chunk_size=None):
+    validator = Validator()
+    chunk_size = chunk_size or len(data) or 1
+    for i in range(0, len(data), chunk_size):
+        validator.feed(data[i : i + chunk_size])
+    return validator.finish()
+
+
+class TestValidator:
+    def test_valid(self):
+        data = (header(led_count=3, fps=60) + 0 + "abc" + linesep + 1 + 2).as_bytes()
+
+        for chunk_size in (1, 2, 7, None):
+            report = validate(data, chunk_size)
+            assert report.ok
+            assert report.frame_count == 3
+            assert report.problems == []
+
+    def test_every_problem(self):
+        data = header(led_count=1, fps=60) + 0
+        data.entries.append("#abc" + linesep)
+        data = data + "text" + linesep + 1
+        data.entries.append("#zzzzzz" + linesep)
+        data = data + 2
+        raw = data.as_bytes()
+
+        report = validate(raw, 5)
+        assert report.frame_count == 3
+        assert [offset for offset, _ in report.problems] == [raw.find(b"#abc"), raw.find(b"#zzzzzz")]
+
+    def test_header_problems(self):
+        assert validate(b"no header" + linesep.encode()).problems == [(9 + len(linesep), "Stream has no header.")]
+
+        report = validate(b'#{"version": 0, "led_count": "500", "fps": 60}' + linesep.encode())
+        assert not report.ok
+        assert "led_count" in report.problems[0][1]
+
+        report = validate(b"#null" + linesep.encode())
+        assert report.problems[0][1] == "Header must be a JSON object."
+
+    def test_records(self):
+        frames = [random_frame(2, i) for i in range(3)]
+        data = ("#" + encode_header(2, 60, version=1, encodings=["repeat"]) + linesep).encode()
+        data += encode_binary_frame(frames[0], 2)
+        data += encode_compressed_frame(frames[0], 2, encode_binary_frame(frames[0], 2)[6:], ["repeat"])
+        bad = len(data)
+        data += encode_record(0x03, b"")
+        data += encode_binary_frame(frames[1], 2)
+
+        report = validate(data, 4)
+        assert report.frame_count == 3
+        assert report.problems == [(bad, "Record type 3 is not allowed by the header.")]
+
+    def test_corrupt_record_length(self):
+        frames = [random_frame(2, i) for i in range(2)]
+        data = ("#" + encode_header(2, 60, version=1) + linesep).encode()
+        data += encode_binary_frame(frames[0], 2)
+        bad = len(data)
+        data += b"#\x01\xff\xff\xff\xff" + encode_binary_frame(frames[1], 2)
+        data += b"#\x01\x00\x00\x00\x06\x00"  # cut off
+
+        report = validate(data, 3)
+        assert report.frame_count == 2
+        assert report.problems == [
+            (bad, "Record is too long for a frame of 2 leds (4294967301 bytes)."),
+            (data.rfind(b"#"), "Stream ends in the middle of jelka data."),
+        ]
+
+    def test_incomplete(self):
+        data = (header(led_count=3, fps=60) + 0).as_bytes()
+
+        report = validate(data[:-5])
+        assert report.problems == [(data.rfind(b"#"), "Stream ends in the middle of jelka data.")]
+
+    def test_max_problems(self):
+        data = header(led_count=1, fps=60)
+        for _ in range(5):
+            data.entries.append("#00" + linesep)
+
+        validator = Validator(max_problems=2)
+        validator.feed(data.as_bytes())
+        report = validator.finish()
+        assert len(report.problems) == 2
+        assert report.problem_count == 5
+
+
+class TestValidateCommand:
+    def test_files(self, tmp_path):
+        paths = []
+        for i in range(3):
+            path = tmp_path / f"pattern{i}.txt"
+            data = header(led_count=2, fps=60) + 0 + 1
+            if i == 1:
+                data.entries.append("#00" + linesep)
+            path.write_bytes(data.as_bytes())
+            paths.append(str(path))
+
+        reports = validate_files(paths, jobs=2)
+        assert [report.ok for report in reports] == [True, False, True]
+        assert [report.name for report in reports] == paths
+        assert validate_file(str(tmp_path / "missing")).problem_count == 1
+
+    def test_main(self, tmp_path, capsys):
+        path = tmp_path / "pattern.txt"
+        path.write_bytes((header(led_count=2, fps=60) + 0).as_bytes())
+
+        assert main([str(path)]) == 0
+        assert capsys.readouterr().out == f"{path}: OK (1 frames){linesep}"
+
+        path.write_bytes(path.read_bytes() + b"#00" + linesep.encode())
+        assert main(["-q", str(path)]) == 1
+        assert capsys.readouterr().out.startswith(f"{path}:")
+
+    def test_process(self):
+        code = "from jelka_validator.datawriter import DataWriter; DataWriter(2, 60).write_frame([(1, 2, 3)] * 2)"
+        report = validate_process([sys.executable, "-c", code])
+        assert report.ok
+        assert report.frame_count == 1